@@ -0,0 +1,175 @@
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Sequence, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import ColumnElement, Engine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import crud
+import snapshot
+from config import config
+from database import engine, get_async_engine
+from models import CliCommand, Facets, Preset, PresetChanges, PresetDiff, PresetMerge, PresetSearchHit, SearchFilter
+
+
+T = TypeVar("T")
+
+USE_ASYNC_ENGINE = config["database"]["mode"] == "async"
+
+
+def _run_sync(bind: Engine, fn: Callable[..., T], *args) -> T:
+    with Session(bind) as session:
+        return fn(session, *args)
+
+
+async def run(fn: Callable[..., T], *args) -> T:
+    """
+    Runs a session-level function from crud.py without blocking the event loop.
+
+    With the async engine the function runs through AsyncSession.run_sync, so its queries are
+    awaited on aiosqlite. With the sync engine it runs on the threadpool, as sync routes did.
+
+    Args:
+        fn (Callable): A function taking a session as its first argument.
+        *args: The remaining arguments for fn.
+    """
+    if USE_ASYNC_ENGINE:
+        async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+            return await session.run_sync(fn, *args)
+    return await run_in_threadpool(_run_sync, engine, fn, *args)
+
+
+async def read(fn: Callable[..., T], *args) -> T:
+    """
+    Runs a read-only session-level function from crud.py, like run().
+
+    With database.snapshot enabled, it runs on the threadpool against the in-memory snapshot
+    instead, so it never touches the file or waits on a writer.
+
+    Args:
+        fn (Callable): A function taking a session as its first argument.
+        *args: The remaining arguments for fn.
+    """
+    snapshot_engine = snapshot.get_engine()
+    if snapshot_engine is None:
+        return await run(fn, *args)
+    return await run_in_threadpool(_run_sync, snapshot_engine, fn, *args)
+
+
+async def _iter_all(runner: Callable, get_page: Callable[..., List[T]], after: int | None, batch_size: int, *args) -> AsyncIterator[T]:
+    while True:
+        page = await runner(get_page, after, batch_size, *args)
+        for item in page:
+            yield item
+        if len(page) < batch_size:
+            return
+        after = page[-1].id
+
+
+def _get_search_filters_page(session: Session, after: int | None, limit: int) -> List[SearchFilter]:
+    return crud._get_page(session, SearchFilter, after, limit)
+
+
+async def get_revision() -> int:
+    # The revision of the data reads see, which lags the file while a new snapshot loads.
+    return await read(crud._get_revision)
+
+
+async def get_stored_revision() -> int:
+    return await run(crud._get_revision)
+
+
+async def get_preset(preset_id: int) -> Preset | None:
+    return await read(crud._get_preset, preset_id)
+
+
+async def get_compact_preset(preset_id: int) -> Preset | None:
+    return await read(crud._get_compact_preset, preset_id)
+
+
+async def get_presets(preset_ids: Sequence[int]) -> Dict[int, Preset]:
+    return await read(crud._get_presets, preset_ids)
+
+
+async def get_presets_page(after: int | None = None, limit: int = 128, filters: Sequence[ColumnElement] = ()) -> List[Preset]:
+    return await read(crud._get_presets_page, after, limit, filters)
+
+
+def iter_all_presets(after: int | None = None, batch_size: int = 500, filters: Sequence[ColumnElement] = ()) -> AsyncIterator[Preset]:
+    return _iter_all(read, crud._get_presets_page, after, batch_size, filters)
+
+
+async def get_preset_rows_page(after: int | None = None, limit: int = 128, filters: Sequence[ColumnElement] = ()) -> List[dict]:
+    return await read(crud._get_preset_rows_page, after, limit, filters)
+
+
+async def iter_all_preset_rows(after: int | None = None, batch_size: int = 500, filters: Sequence[ColumnElement] = ()) -> AsyncIterator[dict]:
+    while True:
+        page = await get_preset_rows_page(after, batch_size, filters)
+        for row in page:
+            yield row
+        if len(page) < batch_size:
+            return
+        after = page[-1]["id"]
+
+
+async def get_all_presets() -> List[Preset]:
+    return [preset async for preset in iter_all_presets()]
+
+
+async def search_presets(query: str, limit: int = 20, offset: int = 0) -> List[PresetSearchHit]:
+    return await read(crud._search_presets, query, limit, offset)
+
+
+async def get_facets(filters: Sequence[ColumnElement] = ()) -> Facets:
+    return await read(crud._get_facets, filters)
+
+
+async def create_preset(preset: Preset) -> Preset:
+    return await run(crud._create_preset, preset)
+
+
+async def create_presets(presets: Iterable[Preset], batch_size: int = 500, skip_stored: bool = False) -> List[int]:
+    return await run(crud._create_presets, presets, batch_size, skip_stored)
+
+
+async def update_preset(preset_id: int, preset: Preset) -> Preset | None:
+    return await run(crud._update_preset, preset_id, preset)
+
+
+async def delete_preset(preset_id: int) -> bool:
+    return await run(crud._delete_preset, preset_id)
+
+
+async def get_commands(preset_id: int) -> List[CliCommand] | None:
+    return await read(crud._get_commands, preset_id)
+
+
+async def merge_presets(preset_ids: Sequence[int]) -> PresetMerge | None:
+    return await read(crud._merge_presets, preset_ids)
+
+
+async def diff_presets(a: int, b: int) -> PresetDiff | None:
+    return await read(crud._diff_presets, a, b)
+
+
+async def get_changes(since: int) -> PresetChanges:
+    return await read(crud._get_changes, since)
+
+
+# Search filters are read from the file: writing one does not bump the data revision, so a
+# snapshot would not be reloaded for it.
+async def get_search_filter(filter_id: int) -> SearchFilter | None:
+    return await run(crud._get_search_filter, filter_id)
+
+
+async def get_search_filters_page(after: int | None = None, limit: int = 128) -> List[SearchFilter]:
+    return await run(_get_search_filters_page, after, limit)
+
+
+def iter_all_search_filters(after: int | None = None, batch_size: int = 500) -> AsyncIterator[SearchFilter]:
+    return _iter_all(run, _get_search_filters_page, after, batch_size)
+
+
+async def get_all_search_filters() -> List[SearchFilter]:
+    return [search_filter async for search_filter in iter_all_search_filters()]
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+QUERIES = [
+    "tag:5inch",
+    "tag:freestyle AND tag:5inch",
+    "tag:racing OR tag:cinematic OR tag:longrange",
+    "tag:5inch AND NOT tag:analog",
+    "author:BFQuickLoad",
+    "author:pilot7",
+    "author:pilot7 OR author:pilot8 OR author:pilot9",
+    "(tag:whoop OR tag:micro) AND NOT (author:BFQuickLoad OR tag:analog)",
+]
+
+
+def time_calls(repeat: int, fn: Callable[[], object]) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"p50_us": round(statistics.median(timings) * 1e6, 1), "max_us": round(max(timings) * 1e6, 1)}
+
+
+def benchmark_bitmap_index(presets: int = 1_000_000, repeat: int = 200, seed: int = 0):
+    """
+    Reports the build time, memory footprint and query latency of the tag and author bitmap index.
+
+    The index is built from the tags and authors of a synthetic corpus, without a database, so
+    1M presets take seconds instead of an import. Every query is timed as evaluation plus count,
+    once on its first run and then repeatedly, and again with its first page of 128 ids, the
+    work of a /presets/filter request.
+
+    Args:
+        presets (int): Number of synthetic presets to index.
+        repeat (int): Runs per measurement.
+        seed (int): Seed of the synthetic corpus.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        from benchmark_db_modes import write_benchmark_config
+        os.environ["BFQUICKLOAD_CONFIG"] = write_benchmark_config(directory)
+
+        import itertools
+
+        from bitmap_index import BitmapIndex, iter_ids
+        from synthetic_presets import generate_tags_and_authors
+
+        rows = [(preset_id, author, tags) for preset_id, (tags, author)
+                in enumerate(generate_tags_and_authors(0, presets, seed), start=1)]
+        index = BitmapIndex()
+        start = time.perf_counter()
+        index.build(rows, revision=1)
+        build_seconds = time.perf_counter() - start
+
+        dense = sum(isinstance(posting, int) for posting in index.postings.values())
+        report = {
+            "presets": presets,
+            "build_seconds": round(build_seconds, 2),
+            "memory_mb": round(index.memory_bytes() / 2 ** 20, 1),
+            "keys": len(index.postings),
+            "dense_keys": dense,
+            "sparse_keys": len(index.postings) - dense,
+            "queries": [],
+        }
+        for query in QUERIES:
+            # The first run converts sparse postings to bitsets, later runs find them cached.
+            start = time.perf_counter()
+            count = index.query(query).bit_count()
+            report["queries"].append({
+                "query": query,
+                "count": count,
+                "first_run_us": round((time.perf_counter() - start) * 1e6, 1),
+                "count_only": time_calls(repeat, lambda: index.query(query).bit_count()),
+                "first_page": time_calls(repeat, lambda: list(itertools.islice(iter_ids(index.query(query)), 128))),
+            })
+
+        rng = random.Random(f"{seed}:changes")
+        for changes in (1, 100):
+            changed = [(rng.randint(1, presets), f"pilot{rng.randrange(1000)}", ["5inch"]) for _ in range(changes)]
+            start = time.perf_counter()
+            index.apply_changes(changed, [], revision=2)
+            report[f"patch_{changes}_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=benchmark_bitmap_index.__doc__.strip().splitlines()[0])
+    parser.add_argument("--presets", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark_bitmap_index(presets=args.presets, repeat=args.repeat, seed=args.seed)
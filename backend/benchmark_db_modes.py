@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import yaml
+
+
+def write_benchmark_config(directory: str) -> str:
+    """
+    Writes a copy of config.yaml that points to a fresh database in the given directory.
+
+    The benchmark must never touch the real database, so the config is swapped before any
+    backend module is imported.
+    """
+    with open("config.yaml", "r") as f:
+        benchmark_config = yaml.safe_load(f)
+    benchmark_config["database"]["filename"] = os.path.join(directory, "benchmark.db")
+
+    config_path = os.path.join(directory, "config.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump(benchmark_config, f)
+    return config_path
+
+
+async def run_requests(client, paths: list, concurrency: int) -> float:
+    queue = list(paths)
+
+    async def worker():
+        while queue:
+            response = await client.get(queue.pop())
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - start
+
+
+async def benchmark_mode(app, use_async_engine: bool, paths: list, concurrency: int) -> dict:
+    import httpx
+
+    import async_crud
+    from cache import catalog_cache
+
+    async_crud.USE_ASYNC_ENGINE = use_async_engine
+    catalog_cache.invalidate()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await run_requests(client, paths[:concurrency], concurrency)  # Warm up caches and pools
+        seconds = await run_requests(client, paths, concurrency)
+
+    return {
+        "mode": "async" if use_async_engine else "sync",
+        "requests": len(paths),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(len(paths) / seconds, 1),
+    }
+
+
+def benchmark_db_modes(presets: int = 1000, requests: int = 2000, concurrency: int = 64):
+    """
+    Compares the throughput of the sync (threadpool) and async (aiosqlite) database modes.
+
+    The app is driven in-process through an ASGI client with a mix of catalog and single preset
+    reads against a temporary database filled with synthetic presets.
+
+    Args:
+        presets (int): Number of presets in the temporary database.
+        requests (int): Number of requests per mode.
+        concurrency (int): Number of requests in flight at the same time.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["BFQUICKLOAD_CONFIG"] = write_benchmark_config(directory)
+
+        import crud
+        import database
+        from main import app
+        from models import Preset
+
+        database.create_db_and_tables()
+        crud.create_presets(Preset(
+            name=f"Benchmark Preset {i}",
+            description="Synthetic preset for benchmarking.",
+            tags=["benchmark", f"group{i % 10}"],
+            author=f"author{i % 25}",
+            content=f"set thr_mid = {i % 100}\nset thr_expo = {i % 100}"
+        ) for i in range(presets))
+
+        rng = random.Random(0)
+        paths = ["/presets/catalog" if rng.random() < 0.5 else f"/presets/{rng.randint(1, presets)}"
+                 for _ in range(requests)]
+
+        async def run_modes():
+            # One event loop for both modes: the async engine's connections are bound to it.
+            modes = [await benchmark_mode(app, use_async_engine, paths, concurrency)
+                     for use_async_engine in (False, True)]
+            await database.get_async_engine().dispose()
+            return modes
+
+        results = asyncio.run(run_modes())
+        database.engine.dispose()
+
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=benchmark_db_modes.__doc__.strip().splitlines()[0])
+    parser.add_argument("--presets", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    benchmark_db_modes(presets=args.presets, requests=args.requests, concurrency=args.concurrency)
@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmark_db_modes import write_benchmark_config
+
+ENDPOINTS = ["catalog", "presets", "preset", "search_filters"]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def endpoint_paths(endpoint: str, presets: int, search_filters: int, requests: int, rng: random.Random) -> list:
+    if endpoint == "catalog":
+        return ["/presets/catalog"] * requests
+    if endpoint == "presets":
+        return [f"/presets?after={rng.randrange(presets)}&limit=128" for _ in range(requests)]
+    if endpoint == "preset":
+        return [f"/presets/{rng.randint(1, presets)}" for _ in range(requests)]
+    if endpoint == "search_filters":
+        return [f"/search_filters?after={rng.randrange(search_filters)}&limit=128" for _ in range(requests)]
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+async def measure(client, paths: list, concurrency: int) -> dict:
+    latencies = []
+    remaining = iter(paths)
+
+    async def worker():
+        for path in remaining:
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    seconds = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(paths),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(len(paths) / seconds, 1),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+    }
+
+
+def grow_corpus(start: int, stop: int, seed: int):
+    import crud
+    from database import engine
+    from models import SearchFilter
+    from sqlmodel import Session
+    from synthetic_presets import generate_presets, generate_search_filters
+
+    crud.create_presets(generate_presets(start, stop, seed), batch_size=5000)
+    with Session(engine) as session:
+        # One search filter per 100 presets, always regenerated from the start of the sequence.
+        session.exec(SearchFilter.__table__.delete())
+        session.add_all(generate_search_filters(max(stop // 100, 10), seed))
+        session.commit()
+
+
+def benchmark_endpoints(sizes: list, requests: int = 1000, concurrency: int = 32, endpoints: list = ENDPOINTS,
+                        seed: int = 0, output: str | None = None) -> dict:
+    """
+    Benchmarks the main read endpoints against synthetic corpora of growing size.
+
+    The app runs in-process behind an ASGI client, on a temporary database that is grown from
+    one size to the next. Every size reports p50/p99 latency and throughput per endpoint as JSON,
+    so runs on different commits can be compared.
+
+    Args:
+        sizes (list): Numbers of presets to benchmark at, in ascending order.
+        requests (int): Number of requests per endpoint and size.
+        concurrency (int): Number of requests in flight at the same time.
+        endpoints (list): The endpoints to benchmark, out of ENDPOINTS.
+        seed (int): Seed of the synthetic corpus and the request mix.
+        output (str | None): File to write the results to, besides printing them.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["BFQUICKLOAD_CONFIG"] = write_benchmark_config(directory)
+
+        import httpx
+
+        import database
+        from config import config
+        from main import app
+
+        database.create_db_and_tables()
+
+        async def run_sizes():
+            results = []
+            corpus_size = 0
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                for size in sorted(sizes):
+                    start = time.perf_counter()
+                    grow_corpus(corpus_size, size, seed)
+                    corpus_size = size
+                    print(f"Generated {size} presets in {time.perf_counter() - start:.1f}s", flush=True)
+
+                    rng = random.Random(f"{seed}:{size}")
+                    search_filters = max(size // 100, 10)
+                    for endpoint in endpoints:
+                        paths = endpoint_paths(endpoint, size, search_filters, requests, rng)
+                        await measure(client, paths[:concurrency], concurrency)  # Warm up caches and pools
+                        result = {"presets": size, "endpoint": endpoint, **await measure(client, paths, concurrency)}
+                        print(json.dumps(result), flush=True)
+                        results.append(result)
+            if config["database"]["mode"] == "async":
+                await database.get_async_engine().dispose()
+            return results
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database_mode": config["database"]["mode"],
+            "seed": seed,
+            "results": asyncio.run(run_sizes()),
+        }
+        database.engine.dispose()
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=benchmark_endpoints.__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000",
+                        help="Comma separated corpus sizes, e.g. 1000,100000,1000000.")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    args = parser.parse_args()
+    benchmark_endpoints(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        requests=args.requests,
+        concurrency=args.concurrency,
+        endpoints=args.endpoints.split(","),
+        seed=args.seed,
+        output=args.output
+    )
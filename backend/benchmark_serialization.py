@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+
+def best_of(repeat: int, fn: Callable[[], bytes]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_serialization(presets: int = 20000, page_sizes: List[int] = (128, 1000), repeat: int = 5):
+    """
+    Compares the response_model serialization path with the fast_json path of /presets and /presets/catalog.
+
+    The model path builds a Pydantic model per row and validates and serializes the list the
+    way FastAPI does for a response_model. The fast path serializes plain dicts projected from
+    SQL. Both must produce identical bytes, which is checked before timing.
+
+    Args:
+        presets (int): Number of synthetic presets in the temporary database.
+        page_sizes (List[int]): The /presets page sizes to time.
+        repeat (int): Runs per measurement; the fastest one is reported.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        from benchmark_db_modes import write_benchmark_config
+        os.environ["BFQUICKLOAD_CONFIG"] = write_benchmark_config(directory)
+
+        from pydantic import TypeAdapter
+        from sqlmodel import Session
+
+        import cache
+        import crud
+        import database
+        import fast_json
+        from models import Preset, PresetMetadata, PresetRecord, PresetsCatalog
+        from synthetic_presets import generate_presets
+
+        database.create_db_and_tables()
+        crud.create_presets(generate_presets(0, presets), batch_size=5000)
+        presets_adapter = TypeAdapter(List[Preset])
+
+        def model_catalog(session: Session) -> bytes:
+            records = list(crud._iter_all(session, PresetRecord, None, 500))
+            catalog = PresetsCatalog(
+                presets_metadata=[PresetMetadata.model_validate(r, from_attributes=True) for r in records],
+                authors=sorted({r.author for r in records}),
+                tags=sorted({tag for r in records for tag in r.tags})
+            )
+            return catalog.model_dump_json().encode()
+
+        results = []
+        with Session(database.engine) as session:
+            cases = [(f"presets?limit={limit}",
+                      lambda limit=limit: presets_adapter.dump_json(presets_adapter.validate_python(
+                          crud._get_presets_page(session, None, limit), from_attributes=True)),
+                      lambda limit=limit: fast_json.dumps(crud._get_preset_rows_page(session, None, limit)))
+                     for limit in page_sizes]
+            cases.append(("presets/catalog",
+                          lambda: model_catalog(session),
+                          lambda: cache._build_catalog(session, 500, 0).body))
+
+            for name, model_path, fast_path in cases:
+                if model_path() != fast_path():
+                    raise AssertionError(f"The fast path of {name} does not match the model path")
+                model_seconds = best_of(repeat, model_path)
+                fast_seconds = best_of(repeat, fast_path)
+                results.append({
+                    "endpoint": name,
+                    "presets": presets,
+                    "model_ms": round(model_seconds * 1000, 2),
+                    "fast_ms": round(fast_seconds * 1000, 2),
+                    "speedup": round(model_seconds / fast_seconds, 2),
+                    "orjson": fast_json.orjson is not None,
+                })
+        database.engine.dispose()
+
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=benchmark_serialization.__doc__.strip().splitlines()[0])
+    parser.add_argument("--presets", type=int, default=20000)
+    parser.add_argument("--page-sizes", default="128,1000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    benchmark_serialization(presets=args.presets, page_sizes=[int(size) for size in args.page_sizes.split(",")],
+                            repeat=args.repeat)
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+def benchmark_single_flight(presets: int = 2000, burst: int = 200, rounds: int = 20):
+    """
+    Load-tests bursts of identical requests with and without single-flight coalescing.
+
+    Every round sends `burst` concurrent requests for one preset, then as many for the catalog,
+    and counts the SQL statements they ran. Without coalescing, every preset request reads the
+    preset and every catalog request looks up the data revision. The revision watcher is not
+    started, so no catalog request skips that lookup.
+
+    Args:
+        presets (int): Number of synthetic presets in the temporary database.
+        burst (int): Concurrent identical requests per burst.
+        rounds (int): Bursts per endpoint; each preset burst asks for another preset.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        from benchmark_db_modes import write_benchmark_config
+        os.environ["BFQUICKLOAD_CONFIG"] = write_benchmark_config(directory)
+
+        import httpx
+        from sqlalchemy import Engine, event
+
+        import crud
+        import database
+        import main
+        from cache import catalog_cache
+        from synthetic_presets import generate_presets
+
+        database.create_db_and_tables()
+        crud.create_presets(generate_presets(0, presets), batch_size=5000)
+
+        statements = 0
+
+        def count_statement(*args):
+            nonlocal statements
+            statements += 1
+
+        event.listen(Engine, "after_cursor_execute", count_statement)
+
+        async def run_bursts(client, paths: list) -> dict:
+            nonlocal statements
+            statements = 0
+            start = time.perf_counter()
+            for path in paths:
+                responses = await asyncio.gather(*[client.get(path) for _ in range(burst)])
+                for response in responses:
+                    response.raise_for_status()
+            return {"seconds": round(time.perf_counter() - start, 3), "statements": statements}
+
+        async def run_modes():
+            results = []
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                for enabled in (False, True):
+                    for flight, paths in ((main.preset_flight, [f"/presets/{i + 1}" for i in range(rounds)]),
+                                          (main.catalog_flight, ["/presets/catalog"] * rounds)):
+                        flight.enabled = enabled
+                        flight.calls = flight.coalesced = 0
+                        catalog_cache.invalidate()
+                        result = await run_bursts(client, paths)
+                        results.append({
+                            "flight": flight.name,
+                            "single_flight": enabled,
+                            "requests": burst * rounds,
+                            **result,
+                            "statements_per_request": round(result["statements"] / (burst * rounds), 3),
+                            "coalescing_ratio": round(flight.coalesced / flight.calls, 3),
+                        })
+            return results
+
+        results = asyncio.run(run_modes())
+        event.remove(Engine, "after_cursor_execute", count_statement)
+        database.engine.dispose()
+
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=benchmark_single_flight.__doc__.strip().splitlines()[0])
+    parser.add_argument("--presets", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    benchmark_single_flight(presets=args.presets, burst=args.burst, rounds=args.rounds)
@@ -0,0 +1,97 @@
+import re
+from typing import Iterator, List, Sequence, Tuple
+
+from sqlalchemy import Connection, delete
+
+from models import CliCommand, Preset, PresetCommand
+
+# Betaflight prints the active profile as a comment in dumps ("# profile 0") and presets may
+# switch it with the command itself ("profile 0"). Both start a section.
+SECTION_PATTERN = re.compile(r"^#?\s*(profile|rateprofile)\s+(\d+)\s*$", re.IGNORECASE)
+
+# The values Betaflight gives an unused slot, as dumps print them after the slot number.
+SLOT_DEFAULTS = {
+    "aux": "0 0 900 900 0 0",
+    "adjrange": "0 0 900 900 0 0 0 0",
+}
+
+# Commands that act when they run instead of setting a value. They are never dropped or moved,
+# and nothing is dropped across save or defaults: they end what the lines before them set.
+ACTION_COMMANDS = {"profile", "rateprofile", "save", "defaults", "batch", "exit", "reboot"}
+BARRIER_COMMANDS = {"save", "defaults", "exit", "reboot"}
+
+
+def _parse(content: str) -> Iterator[Tuple[int, str, str, str, int | None, int | None]]:
+    # Yields (line, command, name, value, profile, rateprofile) per command. Plain tuples, as
+    # index_commands() runs this over every line of a bulk import.
+    profile = rateprofile = None
+    for line_number, line in enumerate(content.splitlines()):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line[0] in "#pPrR":
+            section = SECTION_PATTERN.match(line)
+            if section:
+                if section.group(1).lower() == "profile":
+                    profile = int(section.group(2))
+                else:
+                    rateprofile = int(section.group(2))
+            if line[0] == "#":
+                continue
+
+        command, _, arguments = line.partition(" ")
+        command = command.lower()
+        arguments = arguments.strip()
+        if command == "set":
+            name, _, value = arguments.partition("=")
+            name = name.strip().lower()
+        else:
+            slot, _, rest = arguments.partition(" ")
+            if slot.isdigit():
+                name, value = f"{command} {slot}", rest
+            else:
+                name, value = command, arguments
+        yield line_number, command, name, value.strip(), profile, rateprofile
+
+
+def parse_commands(content: str) -> List[CliCommand]:
+    """
+    Parses Betaflight CLI content into its commands.
+
+    Comments and blank lines are skipped. Every command remembers the profile and rateprofile
+    section it appears in, since `set` commands in those sections only apply to that profile.
+
+    Args:
+        content (str): The CLI content of a preset.
+    """
+    return [CliCommand(line=line, command=command, name=name, value=value, profile=profile, rateprofile=rateprofile)
+            for line, command, name, value, profile, rateprofile in _parse(content)]
+
+
+def index_commands(connection: Connection, presets: Sequence[Preset]):
+    # Parsed once per write; reads only ever look at preset_command. Rows go straight to the
+    # driver: bulk imports write dozens of them per preset.
+    rows = [(p.id, *command) for p in presets for command in _parse(p.content)]
+    if rows:
+        connection.exec_driver_sql(
+            "INSERT INTO preset_command(preset_id, line, command, name, value, profile, rateprofile) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+
+def unindex_commands(connection: Connection, preset_id: int):
+    connection.execute(delete(PresetCommand).where(PresetCommand.preset_id == preset_id))
+
+
+def render_command(command: CliCommand) -> str:
+    if command.command == "set":
+        return f"set {command.name} = {command.value}"
+    return f"{command.name} {command.value}".rstrip()
+
+
+def is_slot_default(command: CliCommand) -> bool:
+    # Dumps list every slot; the unused ones only restate the defaults of a freshly reset board.
+    is_slot = command.name != command.command
+    return is_slot and SLOT_DEFAULTS.get(command.command) == " ".join(command.value.split())
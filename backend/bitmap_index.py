@@ -0,0 +1,280 @@
+import asyncio
+import bisect
+import re
+import sys
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from sqlmodel import Session
+
+import async_crud
+import crud
+from config import config
+from database import engine
+from revision_watcher import revision_watcher
+
+MAX_PATCH_CHANGES = config["bitmap_index"]["max_patch_changes"]
+# Bitsets of sparse postings kept after a query converted them, at most 8 MB at 1M presets.
+SPARSE_BITS_CACHE_SIZE = 64
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|(AND|OR|NOT)\b|(tag|author):(?:"((?:[^"]|"")*)"|([^\s()"]+)))')
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+ITER_WINDOW_BITS = 1 << 16
+
+# A posting holds the ids of the presets with one tag or author: a bitset in a Python int where
+# bit i is preset i, or a sorted array of the ids when they are too few to pay for a bitset as
+# long as the largest id. With 1000 authors, dense bitsets alone would take 125 MB at 1M presets.
+Posting = int | array
+Key = Tuple[str, str]
+
+
+def _to_bits(ids: Iterable[int], max_id: int) -> int:
+    buffer = bytearray(max_id // 8 + 1)
+    for preset_id in ids:
+        buffer[preset_id >> 3] |= 1 << (preset_id & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _is_dense(size: int, max_id: int) -> bool:
+    # An array costs 8 bytes per id, a bitset one bit per id up to max_id.
+    return size * 64 >= max_id
+
+
+def _posting(ids: List[int], max_id: int) -> Posting:
+    return _to_bits(ids, max_id) if _is_dense(len(ids), max_id) else array("q", sorted(ids))
+
+
+def _keys(author: str, tags: Sequence[str]) -> Iterator[Key]:
+    yield "author", author
+    for tag in set(tags):
+        yield "tag", tag
+
+
+def iter_ids(bits: int, after: int | None = None) -> Iterator[int]:
+    """
+    Yields the ids in a bitset in ascending order, starting after the id `after`.
+    """
+    start = max(after + 1, 0) if after is not None else 0
+    # Window by window, so a page near the start does not convert the whole bitset to bytes.
+    low = start - start % 8
+    while low < bits.bit_length():
+        high = low + ITER_WINDOW_BITS
+        data = ((bits & ((1 << high) - 1)) >> low).to_bytes(ITER_WINDOW_BITS // 8, "little")
+        # The regex engine skips runs of empty bytes, so sparse results are cheap too.
+        for match in NONZERO_BYTE.finditer(data):
+            offset = low + match.start() * 8
+            value = data[match.start()]
+            for bit in range(8):
+                if value >> bit & 1 and offset + bit >= start:
+                    yield offset + bit
+        low = high
+
+
+class BitmapIndex:
+    """
+    Maps every tag and author to the ids of its presets, for AND/OR/NOT filters answered in memory.
+
+    Like the catalog cache, the index is tagged with the data revision it was built from. When
+    the revision moves on, only the presets changed or deleted since then are patched in;
+    past bitmap_index.max_patch_changes changes the index is built again on a worker thread.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.revision: int | None = None
+        self.max_id = 0
+        self.all = 0
+        self.postings: Dict[Key, Posting] = {}
+        self._sparse_bits: OrderedDict[Key, int] = OrderedDict()
+
+    def build(self, rows: Iterable[Tuple[int, str, Sequence[str]]], revision: int):
+        """
+        Replaces the index with one built from (id, author, tags) rows.
+
+        Args:
+            rows (Iterable[Tuple[int, str, Sequence[str]]]): Every preset.
+            revision (int): The data revision the rows are current for.
+        """
+        ids_by_key: Dict[Key, List[int]] = defaultdict(list)
+        all_ids = []
+        for preset_id, author, tags in rows:
+            all_ids.append(preset_id)
+            for key in _keys(author, tags):
+                ids_by_key[key].append(preset_id)
+        max_id = max(all_ids, default=0)
+        postings = {key: _posting(ids, max_id) for key, ids in ids_by_key.items()}
+        self.max_id, self.all, self.postings, self.revision = max_id, _to_bits(all_ids, max_id), postings, revision
+        self._sparse_bits = OrderedDict()
+
+    def apply_changes(self, changed: Sequence[Tuple[int, str, Sequence[str]]], deleted: Sequence[int], revision: int):
+        """
+        Patches the index with presets written and deleted since its revision.
+
+        Args:
+            changed (Sequence[Tuple[int, str, Sequence[str]]]): (id, author, tags) of written presets.
+            deleted (Sequence[int]): Ids of deleted presets.
+            revision (int): The data revision the changes bring the index to.
+        """
+        # The previous tags and author of a changed preset are unknown, so it leaves every posting.
+        stale = sorted({preset_id for preset_id, _, _ in changed}.union(deleted))
+        self.max_id = max([self.max_id, *stale])
+        keep_bits = ~_to_bits(stale, self.max_id)
+        for key, posting in self.postings.items():
+            if isinstance(posting, int):
+                self.postings[key] = posting & keep_bits
+                continue
+            for preset_id in stale:
+                position = bisect.bisect_left(posting, preset_id)
+                if position < len(posting) and posting[position] == preset_id:
+                    del posting[position]
+                    self._sparse_bits.pop(key, None)
+
+        added: Dict[Key, List[int]] = defaultdict(list)
+        for preset_id, author, tags in changed:
+            for key in _keys(author, tags):
+                added[key].append(preset_id)
+        for key, ids in added.items():
+            posting = self.postings.get(key)
+            if posting is None:
+                self.postings[key] = _posting(ids, self.max_id)
+            elif isinstance(posting, int):
+                self.postings[key] = posting | _to_bits(ids, self.max_id)
+            else:
+                for preset_id in ids:
+                    bisect.insort(posting, preset_id)
+                self._sparse_bits.pop(key, None)
+                if _is_dense(len(posting), self.max_id):
+                    self.postings[key] = _to_bits(posting, self.max_id)
+
+        for key in [key for key, posting in self.postings.items() if not posting]:
+            del self.postings[key]
+        self.all = (self.all & keep_bits) | _to_bits((preset_id for preset_id, _, _ in changed), self.max_id)
+        self.revision = revision
+
+    def bits(self, field: str, value: str) -> int:
+        key = (field, value)
+        posting = self.postings.get(key, 0)
+        if isinstance(posting, int):
+            return posting
+        bits = self._sparse_bits.get(key)
+        if bits is None:
+            bits = self._sparse_bits[key] = _to_bits(posting, self.max_id)
+            if len(self._sparse_bits) > SPARSE_BITS_CACHE_SIZE:
+                self._sparse_bits.popitem(last=False)
+        self._sparse_bits.move_to_end(key)
+        return bits
+
+    def query(self, expression: str) -> int:
+        """
+        Evaluates a filter expression and returns the bitset of the matching preset ids.
+
+        Terms are `tag:<tag>` or `author:<author>`, quoted with double quotes if they contain
+        spaces or parentheses, and combine with NOT, AND and OR, in this order of precedence, and
+        parentheses. Adjacent terms are ANDed: `tag:5inch (author:Luki OR NOT tag:racing)`.
+
+        Args:
+            expression (str): The filter expression.
+
+        Raises:
+            ValueError: If the expression cannot be parsed.
+        """
+        tokens = []
+        position = 0
+        expression = expression.rstrip()
+        while position < len(expression):
+            match = TOKEN.match(expression, position)
+            if match is None:
+                raise ValueError(f"Cannot parse the filter at position {position}: {expression[position:position + 20]!r}")
+            opening, closing, operator, field, quoted, plain = match.groups()
+            if field is not None:
+                tokens.append(("term", (field, plain if quoted is None else quoted.replace('""', '"'))))
+            else:
+                tokens.append((opening or closing or operator, None))
+            position = match.end()
+        if not tokens:
+            raise ValueError("The filter is empty")
+        tokens.append(("end", None))
+
+        position = 0
+
+        def peek() -> str:
+            return tokens[position][0]
+
+        def take(kind: str):
+            nonlocal position
+            if peek() != kind:
+                raise ValueError(f"Expected {kind} in the filter, found {peek()}")
+            position += 1
+            return tokens[position - 1][1]
+
+        def parse_or() -> int:
+            bits = parse_and()
+            while peek() == "OR":
+                take("OR")
+                bits |= parse_and()
+            return bits
+
+        def parse_and() -> int:
+            bits = parse_not()
+            while peek() in ("AND", "NOT", "term", "("):
+                if peek() == "AND":
+                    take("AND")
+                bits &= parse_not()
+            return bits
+
+        def parse_not() -> int:
+            if peek() == "NOT":
+                take("NOT")
+                return self.all & ~parse_not()
+            if peek() == "(":
+                take("(")
+                bits = parse_or()
+                take(")")
+                return bits
+            return self.bits(*take("term"))
+
+        bits = parse_or()
+        take("end")
+        return bits
+
+    def memory_bytes(self) -> int:
+        """
+        Returns the memory held by the index, not counting the interned tag and author strings.
+        """
+        size = sys.getsizeof(self.postings) + sys.getsizeof(self.all) + sys.getsizeof(self._sparse_bits)
+        for key, posting in self.postings.items():
+            size += sys.getsizeof(key) + sys.getsizeof(posting)
+        return size + sum(sys.getsizeof(bits) for bits in self._sparse_bits.values())
+
+    async def refresh(self):
+        revision = await revision_watcher.get_revision()
+        if self.revision is not None and revision <= self.revision:
+            return
+        async with self._lock:
+            if self.revision is not None and revision <= self.revision:
+                return
+            if self.revision is not None:
+                changes = await async_crud.get_changes(since=self.revision)
+                if len(changes.changed) + len(changes.deleted) <= MAX_PATCH_CHANGES:
+                    self.apply_changes([(p.id, p.author, p.tags) for p in changes.changed], changes.deleted,
+                                       changes.revision)
+                    return
+            # Built aside on a worker thread and swapped in, so no query sees a half built index.
+            index = BitmapIndex()
+            await async_crud.read(_build_index, index)
+            self.max_id, self.all, self.postings, self.revision = index.max_id, index.all, index.postings, index.revision
+            self._sparse_bits = index._sparse_bits
+
+
+def _build_index(session: Session, index: BitmapIndex):
+    revision, rows = crud._read_with_revision(session, crud._iter_metadata_rows, config["pagination"]["stream_batch_size"])
+    index.build(((row["id"], row["author"], row["tags"]) for row in rows), revision)
+
+
+def build_index():
+    with Session(engine) as session:
+        _build_index(session, preset_bitmaps)
+
+
+preset_bitmaps = BitmapIndex()
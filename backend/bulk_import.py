@@ -0,0 +1,159 @@
+import codecs
+import itertools
+import json
+import re
+import tempfile
+from typing import AsyncIterable, BinaryIO, Iterable, Iterator, List
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+import crud
+from config import config
+from models import BulkImportResult, BulkImportRow, Preset
+
+SPOOL_MEMORY_BYTES = config["bulk_import"]["spool_memory_mb"] * 2 ** 20
+READ_SIZE = 2 ** 16
+# What may follow a decoded number at the end of the buffer and still be part of it: "1." or
+# "1.5e" decode as 1 and 1.5 until the next chunk completes them.
+NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+async def spool(stream: AsyncIterable[bytes]) -> BinaryIO:
+    """
+    Receives a request body in full, in memory up to bulk_import.spool_memory_mb and in a
+    temporary file beyond, so a slow upload never holds the import transaction open.
+
+    The caller closes the returned file.
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    try:
+        async for chunk in stream:
+            # Once spilled to disk, writes would block the event loop.
+            await run_in_threadpool(body.write, chunk)
+        body.seek(0)
+    except BaseException:
+        body.close()
+        raise
+    return body
+
+
+def iter_chunks(file: BinaryIO) -> Iterator[bytes]:
+    while chunk := file.read(READ_SIZE):
+        yield chunk
+
+
+def _iter_array(chunks: Iterator[bytes]) -> Iterator[object]:
+    # Decodes the items of a JSON array one by one, buffering no more than the item being read.
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+
+    def read_more() -> bool:
+        nonlocal buffer, position
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buffer = buffer[position:] + text.decode(chunk)
+        position = 0
+        return True
+
+    def peek() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not read_more():
+                return ""
+
+    if peek() != "[":
+        raise ValueError("Expected a JSON array of presets")
+    position += 1
+    if peek() == "]":
+        position += 1
+    else:
+        while True:
+            peek()
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as e:
+                    if read_more():
+                        continue
+                    raise ValueError(f"Invalid JSON array: {e}") from e
+                # A number at the end of the buffer may go on in the next chunk.
+                if NUMBER_TAIL.fullmatch(buffer, end) and read_more():
+                    continue
+                break
+            position = end
+            yield item
+            separator = peek()
+            position += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError("Invalid JSON array: expected ',' or ']' after an item")
+    if peek():
+        raise ValueError("Invalid JSON array: unexpected data after the array")
+
+
+def iter_documents(chunks: Iterable[bytes]) -> Iterator[bytes | object]:
+    """
+    Splits a request body into preset documents.
+
+    A body starting with "[" is parsed as a JSON array and its items are yielded as they are
+    decoded. Any other body is treated as newline-delimited JSON and its non-empty lines are
+    yielded unparsed, so a broken line only fails that row.
+
+    Raises:
+        ValueError: If the body is a JSON array that cannot be decoded.
+    """
+    chunks = iter(chunks)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+
+    if head.lstrip().startswith(b"["):
+        yield from _iter_array(itertools.chain([head], chunks))
+        return
+
+    buffer = b""
+    for chunk in itertools.chain([head], chunks):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        yield from (line for line in lines if line.strip())
+    if buffer.strip():
+        yield buffer
+
+
+def parse_preset(document: bytes | object) -> Preset:
+    data = json.loads(document) if isinstance(document, bytes) else document
+    if isinstance(data, dict):
+        # Ids are always assigned by the database.
+        data = {key: value for key, value in data.items() if key != "id"}
+    return Preset.model_validate(data)
+
+
+def import_presets(documents: Iterable[bytes | object], batch_size: int) -> BulkImportResult:
+    rows: List[BulkImportRow] = []
+
+    def valid_presets() -> Iterator[Preset]:
+        for index, document in enumerate(documents):
+            try:
+                preset = parse_preset(document)
+            except (ValueError, ValidationError) as e:
+                rows.append(BulkImportRow(index=index, error=str(e)))
+                continue
+            rows.append(BulkImportRow(index=index))
+            yield preset
+
+    ids = crud.create_presets(valid_presets(), batch_size=batch_size)
+    for row, preset_id in zip((row for row in rows if row.error is None), ids):
+        row.id = preset_id
+
+    return BulkImportResult(created=len(ids), failed=len(rows) - len(ids), rows=rows)
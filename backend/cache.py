@@ -0,0 +1,201 @@
+import asyncio
+import bisect
+from array import array
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Tuple
+
+from sqlalchemy import Select
+from sqlmodel import Session
+
+import async_crud
+import crud
+import fast_json
+from config import config
+from models import SearchFilter
+from revision_watcher import revision_watcher
+
+
+CATALOG_PREFIX = b'{"presets_metadata":['
+
+
+class Catalog(NamedTuple):
+    # The serialized PresetsCatalog. Pages are sliced out of it, so no per-preset objects are
+    # kept in memory besides two integers.
+    body: bytes
+    ids: array
+    # Where the metadata of every preset starts in body; the last entry is where the list ends.
+    offsets: array
+    # The part of body after the list: authors, tags and revision.
+    tail: bytes
+
+
+def build_catalog(presets_metadata: Iterable[dict], revision: int) -> Catalog:
+    body = bytearray(CATALOG_PREFIX)
+    ids = array("q")
+    offsets = array("q")
+    authors = set()
+    tags = set()
+    for p in presets_metadata:
+        if ids:
+            body += b","
+        ids.append(p["id"])
+        offsets.append(len(body))
+        body += fast_json.dumps(p)
+        authors.add(p["author"])
+        tags.update(p["tags"])
+    offsets.append(len(body))
+
+    tail = (b'],"authors":' + fast_json.dumps(sorted(authors))
+            + b',"tags":' + fast_json.dumps(sorted(tags))
+            + b',"revision":' + fast_json.dumps(revision) + b"}")
+    body += tail
+    return Catalog(body=bytes(body), ids=ids, offsets=offsets, tail=tail)
+
+
+def catalog_page(catalog: Catalog, start: int, end: int) -> bytes:
+    # The same bytes as a PresetsCatalog holding only the metadata of presets start to end.
+    end = min(end, len(catalog.ids))
+    if start >= end:
+        return CATALOG_PREFIX + catalog.tail
+    # Every item but the last is followed by a comma.
+    items_end = catalog.offsets[end] - (1 if end < len(catalog.ids) else 0)
+    return CATALOG_PREFIX + catalog.body[catalog.offsets[start]:items_end] + catalog.tail
+
+
+def _build_catalog(session: Session, batch_size: int, revision: int) -> Catalog:
+    # Reads only the metadata columns of preset; content_blob is never touched.
+    return build_catalog(crud._iter_metadata_rows(session, batch_size), revision)
+
+
+class CatalogCache:
+    """
+    Keeps the presets catalog and its serialized form in memory.
+
+    The cache is tagged with the data revision it was built from. Every write in crud.py bumps
+    that revision inside its own transaction, so a single primary key lookup per request is
+    enough to notice changes made by any worker process sharing the database. With the revision
+    watcher running, not even that: it refreshes the cache when the revision changes.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._revision: int | None = None
+        self._catalog = build_catalog([], 0)
+
+    async def refresh(self):
+        revision = await revision_watcher.get_revision()
+        if self._revision is not None and revision <= self._revision:
+            return
+        async with self._lock:
+            if self._revision is None or revision > self._revision:
+                # Read the revision again under the lock; a newer one only means a newer catalog.
+                revision = await async_crud.get_revision()
+                if self._revision is not None and revision <= self._revision:
+                    # The snapshot reads go to has not caught up with the watcher yet.
+                    return
+                batch_size = config["pagination"]["stream_batch_size"]
+                self._catalog = await async_crud.read(_build_catalog, batch_size, revision)
+                self._revision = revision
+
+    async def get(self) -> bytes:
+        await self.refresh()
+        return self._catalog.body
+
+    async def get_page(self, after: int | None, limit: int) -> Tuple[bytes, List[int]]:
+        """
+        Returns a serialized page of the catalog with the presets following the id `after`, and
+        the ids of the presets on it.
+
+        Authors and tags always cover the whole catalog, so a client can build its filters
+        from the first page.
+        """
+        await self.refresh()
+        catalog = self._catalog
+        start = bisect.bisect_right(catalog.ids, after) if after is not None else 0
+        return catalog_page(catalog, start, start + limit), catalog.ids[start:start + limit].tolist()
+
+    def invalidate(self):
+        self._revision = None
+
+
+catalog_cache = CatalogCache()
+
+
+class FilterResults(NamedTuple):
+    # The fields of the filter the statement was compiled from, to notice edits of the filter.
+    key: tuple
+    statement: Select
+    revision: int
+    # None until the statement ran once.
+    ids: List[int] | None
+
+
+def _filter_key(search_filter: SearchFilter) -> tuple:
+    return search_filter.search_query, search_filter.author, tuple(search_filter.tags or ())
+
+
+def _update_filter_results(session: Session, statement: Select, revision: int | None, ids: List[int] | None,
+                           max_patch_changes: int) -> Tuple[int, List[int]]:
+    if ids is not None:
+        new_revision, changed, deleted = crud._get_changed_ids(session, revision)
+        if len(changed) + len(deleted) <= max_patch_changes:
+            # Only the changed presets are matched against the filter again.
+            matching = crud._get_matching_ids(session, statement, changed) if changed else []
+            stale = set(changed).union(deleted).difference(matching)
+            if stale.isdisjoint(ids) and set(matching).issubset(ids):
+                return new_revision, ids
+            return new_revision, sorted(set(ids).difference(stale).union(matching))
+    return crud._read_with_revision(session, crud._get_matching_ids, statement)
+
+
+class SearchFilterResultsCache:
+    """
+    Keeps the compiled query and the matching preset ids of recently used saved search filters.
+
+    Like the catalog, cached ids are tagged with the data revision they are current for. When
+    the revision moves on, only the presets changed or deleted since then are matched against
+    the filter, so a popular filter costs two primary key lookups and its ids only change when
+    a matching preset does. Past search_filters.max_patch_changes changes the query runs again.
+    """
+
+    def __init__(self, size: int, max_patch_changes: int):
+        self._lock = asyncio.Lock()
+        self._entries: OrderedDict[int, FilterResults] = OrderedDict()
+        self.size = size
+        self.max_patch_changes = max_patch_changes
+
+    async def get(self, search_filter: SearchFilter) -> Tuple[int, List[int]]:
+        """
+        Returns the current data revision and the ids of the presets matching the filter, in order.
+
+        Args:
+            search_filter (SearchFilter): A stored filter; its id keys the cache.
+        """
+        key = _filter_key(search_filter)
+        revision = await revision_watcher.get_revision()
+        entry = self._entries.get(search_filter.id)
+        if entry is not None and entry.key == key and entry.revision >= revision:
+            self._entries.move_to_end(search_filter.id)
+            return entry.revision, entry.ids
+
+        async with self._lock:
+            entry = self._entries.get(search_filter.id)
+            if entry is None or entry.key != key:
+                entry = FilterResults(key, crud.search_filter_statement(search_filter), 0, None)
+            if entry.ids is None or entry.revision < revision:
+                revision, ids = await async_crud.read(_update_filter_results, entry.statement, entry.revision,
+                                                     entry.ids, self.max_patch_changes)
+                entry = entry._replace(revision=revision, ids=ids)
+            self._entries[search_filter.id] = entry
+            self._entries.move_to_end(search_filter.id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry.revision, entry.ids
+
+    def invalidate(self):
+        self._entries.clear()
+
+
+search_filter_results_cache = SearchFilterResultsCache(
+    config["search_filters"]["cache_size"], config["search_filters"]["max_patch_changes"]
+)
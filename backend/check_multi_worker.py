@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+AUTHOR = "multi-worker-check"
+
+
+def wait_for(condition: Callable[[], bool], timeout: float) -> float | None:
+    # Seconds until condition() held, or None if it did not within the timeout.
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if condition():
+            return round(time.perf_counter() - start, 3)
+        time.sleep(0.01)
+    return None
+
+
+def check_multi_worker(workers: int = 3, port: int = 8100, presets: int = 1000, timeout: float = 30.0) -> dict:
+    """
+    Runs several uvicorn workers on one database and checks that every worker's caches see writes in time.
+
+    Every worker is a separate uvicorn process on its own port, so each one can be asked on its
+    own. A preset is imported through the first worker, then one is renamed by this process, as
+    a script or another service would. Both must reach the catalog and the bitmap index of every
+    worker within invalidation.poll_interval_ms plus a second for the rebuild.
+
+    Args:
+        workers (int): Number of worker processes.
+        port (int): Port of the first worker; the others take the following ones.
+        presets (int): Number of synthetic presets in the temporary database.
+        timeout (float): Seconds to wait for the workers to start.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        from benchmark_db_modes import write_benchmark_config
+        config_path = os.environ["BFQUICKLOAD_CONFIG"] = write_benchmark_config(directory)
+
+        import httpx
+
+        import crud
+        import database
+        from config import config
+        from models import Preset
+        from synthetic_presets import generate_presets
+
+        bound = config["invalidation"]["poll_interval_ms"] / 1000 + 1.0
+        database.create_db_and_tables()
+        crud.create_presets(generate_presets(0, presets), batch_size=5000)
+
+        urls = [f"http://127.0.0.1:{port + i}" for i in range(workers)]
+        processes: List[subprocess.Popen] = [subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port + i), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={**os.environ, "BFQUICKLOAD_CONFIG": config_path}
+        ) for i in range(workers)]
+        try:
+            with httpx.Client(timeout=10) as client:
+                def responds(url: str) -> bool:
+                    try:
+                        return client.get(f"{url}/ping").status_code == 200
+                    except httpx.TransportError:
+                        return False
+
+                for url in urls:
+                    if wait_for(lambda: responds(url), timeout) is None:
+                        raise RuntimeError(f"The worker at {url} did not start")
+
+                def catalog_names(url: str) -> set:
+                    catalog = client.get(f"{url}/presets/catalog").json()
+                    return {p["name"] for p in catalog["presets_metadata"]}
+
+                def filter_count(url: str, query: str) -> int:
+                    return client.get(f"{url}/presets/filter", params={"q": query}).json()["count"]
+
+                # Warm every cache first, so a stale one would show.
+                for url in urls:
+                    catalog_names(url)
+                    filter_count(url, f"author:{AUTHOR}")
+
+                results = []
+                response = client.post(f"{urls[0]}/presets/bulk", json=[
+                    Preset(name="Imported by worker 0", author=AUTHOR, content="set gyro_lpf1_static_hz = 250").model_dump()
+                ])
+                response.raise_for_status()
+                for url in urls:
+                    results.append({"write": "import through worker 0", "worker": url, "catalog_seconds":
+                                    wait_for(lambda: "Imported by worker 0" in catalog_names(url), bound),
+                                    "bitmap_index_seconds":
+                                    wait_for(lambda: filter_count(url, f"author:{AUTHOR}") == 1, bound)})
+
+                crud.update_preset(1, Preset(name="Renamed by another process", author=AUTHOR, content="set x = 1"))
+                for url in urls:
+                    results.append({"write": "update from another process", "worker": url, "catalog_seconds":
+                                    wait_for(lambda: "Renamed by another process" in catalog_names(url), bound),
+                                    "bitmap_index_seconds":
+                                    wait_for(lambda: filter_count(url, f"author:{AUTHOR}") == 2, bound)})
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+            database.engine.dispose()
+
+    report = {"workers": workers, "bound_seconds": bound, "results": results}
+    print(json.dumps(report, indent=2))
+    stale = [r for r in results if r["catalog_seconds"] is None or r["bitmap_index_seconds"] is None]
+    if stale:
+        raise AssertionError(f"{len(stale)} caches were still stale after {bound}s")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=check_multi_worker.__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--presets", type=int, default=1000)
+    args = parser.parse_args()
+    check_multi_worker(workers=args.workers, port=args.port, presets=args.presets)
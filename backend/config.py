@@ -1,7 +1,11 @@
+import os
+
 import yaml
 
+CONFIG_PATH = os.environ.get("BFQUICKLOAD_CONFIG", "config.yaml")
+
 def load_config():
-    with open("config.yaml", "r") as f:
+    with open(CONFIG_PATH, "r") as f:
         return yaml.safe_load(f)
 
 config = load_config()
@@ -0,0 +1,197 @@
+import argparse
+import hashlib
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import Connection, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from config import config
+from models import ContentBlob, ContentDictionary, PresetRecord
+
+CODEC = config["storage"]["codec"]
+LEVEL = config["storage"]["level"]
+DICTIONARY_SIZE = config["storage"]["dictionary_size"]
+
+# Blobs that do not get smaller by compressing them are stored as they are.
+RAW = "raw"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("The zstd codec needs the zstandard package: pip install zstandard")
+    return zstandard
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def compress(data: bytes, codec: str, dictionary: bytes | None = None) -> bytes:
+    if codec == "zlib":
+        if dictionary:
+            compressor = zlib.compressobj(LEVEL, zdict=dictionary)
+            return compressor.compress(data) + compressor.flush()
+        return zlib.compress(data, LEVEL)
+    if codec == "zstd":
+        zstandard = _zstd()
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=LEVEL, dict_data=dict_data).compress(data)
+    raise ValueError(f"Unknown content codec: {codec}")
+
+
+def decompress(data: bytes, codec: str, dictionary: bytes | None = None) -> bytes:
+    if codec == RAW:
+        return data
+    if codec == "zlib":
+        if dictionary:
+            decompressor = zlib.decompressobj(zdict=dictionary)
+            return decompressor.decompress(data) + decompressor.flush()
+        return zlib.decompress(data)
+    if codec == "zstd":
+        zstandard = _zstd()
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+    raise ValueError(f"Unknown content codec: {codec}")
+
+
+def train_dictionary(samples: List[bytes], codec: str, size: int) -> bytes:
+    """
+    Builds a shared compression dictionary from sample contents.
+
+    zstd trains a real dictionary. zlib only supports a preset window, so the lines that save
+    the most bytes across the samples are concatenated, the most valuable last because deflate
+    reaches recent bytes with the shortest distances.
+    """
+    if codec == "zstd":
+        return _zstd().train_dictionary(size, samples).as_bytes()
+
+    line_counts = Counter(line for sample in samples for line in set(sample.splitlines(keepends=True)))
+    valuable_lines = sorted((line for line, count in line_counts.items() if count > 1),
+                            key=lambda line: line_counts[line] * len(line))
+    dictionary = b""
+    for line in reversed(valuable_lines):
+        if len(dictionary) + len(line) > size:
+            break
+        dictionary = line + dictionary
+    return dictionary
+
+
+def _active_dictionary(connection: Connection) -> Tuple[int | None, bytes | None]:
+    row = connection.execute(
+        select(ContentDictionary.id, ContentDictionary.data)
+        .where(ContentDictionary.codec == CODEC)
+        .order_by(ContentDictionary.id.desc())
+        .limit(1)
+    ).first()
+    return (row.id, row.data) if row else (None, None)
+
+
+def _encode(content: str, dictionary_id: int | None, dictionary: bytes | None) -> dict:
+    data = content.encode()
+    compressed = compress(data, CODEC, dictionary)
+    if len(compressed) >= len(data):
+        return {"codec": RAW, "dictionary_id": None, "size": len(data), "data": data}
+    return {"codec": CODEC, "dictionary_id": dictionary_id, "size": len(data), "data": compressed}
+
+
+def store_contents(connection: Connection, contents: Iterable[str]) -> List[str]:
+    """
+    Stores contents that are not stored yet and returns the hash of every content in input order.
+
+    Identical contents share one blob, so they are compressed and written only once.
+    """
+    contents = list(contents)
+    hashes = [content_hash(content) for content in contents]
+    unique = dict(zip(hashes, contents))
+
+    existing = set(connection.execute(
+        select(ContentBlob.hash).where(ContentBlob.hash.in_(unique.keys()))
+    ).scalars())
+    missing = {h: content for h, content in unique.items() if h not in existing}
+    if missing:
+        dictionary_id, dictionary = _active_dictionary(connection)
+        connection.execute(
+            insert(ContentBlob).on_conflict_do_nothing(),
+            [{"hash": h, **_encode(content, dictionary_id, dictionary)} for h, content in missing.items()]
+        )
+    return hashes
+
+
+def load_contents(connection: Connection, hashes: Iterable[str]) -> Dict[str, str]:
+    hashes = set(hashes)
+    if not hashes:
+        return {}
+
+    rows = connection.execute(
+        select(ContentBlob.hash, ContentBlob.codec, ContentBlob.data, ContentDictionary.data.label("dictionary"))
+        .outerjoin(ContentDictionary, ContentBlob.dictionary_id == ContentDictionary.id)
+        .where(ContentBlob.hash.in_(hashes))
+    )
+    return {row.hash: decompress(row.data, row.codec, row.dictionary).decode() for row in rows}
+
+
+def register_sql_functions(connection: Connection):
+    # Lets statements on this connection read contents: decompress_content(codec, data, dictionary).
+    connection.connection.driver_connection.create_function(
+        "decompress_content", 3, lambda codec, data, dictionary: decompress(data, codec, dictionary).decode(),
+        deterministic=True
+    )
+
+
+def delete_unreferenced(connection: Connection, hashes: Iterable[str]):
+    # Blobs are shared by presets with the same content; drop those of the hashes no preset uses anymore.
+    hashes = set(hashes)
+    if not hashes:
+        return
+    connection.execute(
+        ContentBlob.__table__.delete()
+        .where(ContentBlob.hash.in_(hashes))
+        .where(~select(PresetRecord.id).where(PresetRecord.content_hash == ContentBlob.hash).exists())
+    )
+
+
+def retrain_dictionary(connection: Connection, sample_limit: int = 10000) -> int:
+    """
+    Trains a new dictionary on stored contents and recompresses every blob with it.
+
+    Returns:
+        int: Number of bytes saved by recompressing.
+    """
+    sample_hashes = connection.execute(select(ContentBlob.hash).limit(sample_limit)).scalars().all()
+    samples = [content.encode() for content in load_contents(connection, sample_hashes).values()]
+    dictionary = train_dictionary(samples, CODEC, DICTIONARY_SIZE)
+    dictionary_id = connection.execute(
+        insert(ContentDictionary).values(codec=CODEC, data=dictionary).returning(ContentDictionary.id)
+    ).scalar_one()
+
+    saved = 0
+    all_hashes = connection.execute(select(ContentBlob.hash)).scalars().all()
+    for start in range(0, len(all_hashes), 1000):
+        batch = all_hashes[start:start + 1000]
+        old_sizes = dict(connection.execute(
+            select(ContentBlob.hash, func.length(ContentBlob.data)).where(ContentBlob.hash.in_(batch))
+        ).all())
+        for h, content in load_contents(connection, batch).items():
+            encoded = _encode(content, dictionary_id, dictionary)
+            saved += old_sizes[h] - len(encoded["data"])
+            connection.execute(ContentBlob.__table__.update().where(ContentBlob.hash == h).values(**encoded))
+    return saved
+
+
+if __name__ == "__main__":
+    import database
+
+    parser = argparse.ArgumentParser(description="Maintain the compressed preset content store.")
+    parser.add_argument("--retrain-dictionary", action="store_true",
+                        help="Train a shared dictionary on the stored contents and recompress all blobs.")
+    parser.add_argument("--samples", type=int, default=10000)
+    args = parser.parse_args()
+
+    database.create_db_and_tables()
+    if args.retrain_dictionary:
+        with database.engine.begin() as connection:
+            print(f"Recompressed content blobs, saved {retrain_dictionary(connection, args.samples)} bytes.")
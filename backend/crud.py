@@ -1,36 +1,628 @@
-from typing import List
+import itertools
+import json
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple, Type, TypeVar
 
-from sqlmodel import Session, select
+from sqlalchemy import ColumnElement, Connection, Select, delete, func, insert, text
+from sqlmodel import Session, select, update
 
-from database import engine
-from models import Preset, SearchFilter
+import betaflight_cli
+import content_store
+import fts_snippet
+import preset_merge
+from database import PRESET_FTS_TABLE, engine
+from models import (
+    add_revision_to_tag_index, add_to_tag_index, Author, CliCommand, DataRevision, FacetCount, Facets, Preset,
+    PresetChanges, PresetCommand, PresetDiff, PresetMerge, PresetMetadata, PresetRecord, PresetSearchHit, PresetTag,
+    PresetTombstone, SearchFilter
+)
+
+
+ModelT = TypeVar("ModelT", PresetRecord, SearchFilter)
+T = TypeVar("T")
+
+
+REVISION_ROW_ID = 1
+
+# Every public function opens its own session on the sync engine and delegates to a private
+# function of the same name that takes the session. async_crud.py runs the private functions
+# on the async engine, so both paths share one implementation of every query.
+
+
+def _bump_revision(session: Session) -> int:
+    # Atomic increment, so concurrent writers in other processes never lose an update.
+    result = session.exec(
+        update(DataRevision)
+        .where(DataRevision.id == REVISION_ROW_ID)
+        .values(revision=DataRevision.revision + 1)
+    )
+    if result.rowcount == 0:
+        session.add(DataRevision(id=REVISION_ROW_ID, revision=1))
+        return 1
+    return session.get(DataRevision, REVISION_ROW_ID).revision
+
+
+def _get_revision(session: Session) -> int:
+    statement = select(DataRevision.revision).where(DataRevision.id == REVISION_ROW_ID)
+    return session.exec(statement).first() or 0
+
+
+def get_revision() -> int:
+    with Session(engine) as session:
+        return _get_revision(session)
+
+
+def _read_with_revision(session: Session, read: Callable[..., T], *args) -> Tuple[int, T]:
+    """
+    Returns the data revision together with read(session, *args), for state kept in step with it.
+
+    The revision is read first. A preset written in between is then already in the rows, but
+    newer than the returned revision, so the next read of the changes since that revision finds
+    it again: it is at worst sent twice, never skipped.
+    """
+    revision = _get_revision(session)
+    return revision, read(session, *args)
+
+
+def _with_content(session: Session, records: Sequence[PresetRecord]) -> List[Preset]:
+    # One query loads the contents of all records; presets sharing a content share its blob.
+    contents = content_store.load_contents(session.connection(), [r.content_hash for r in records])
+    return [Preset(
+        id=r.id,
+        name=r.name,
+        description=r.description,
+        tags=r.tags,
+        author=r.author,
+        content=contents[r.content_hash]
+    ) for r in records]
+
+
+def _get_preset(session: Session, preset_id: int) -> Preset | None:
+    record = session.get(PresetRecord, preset_id)
+    return _with_content(session, [record])[0] if record else None
 
 
 def get_preset(preset_id: int) -> Preset | None:
     with Session(engine) as session:
-        return session.get(Preset, preset_id)
+        return _get_preset(session, preset_id)
+
+
+def _get_compact_preset(session: Session, preset_id: int) -> Preset | None:
+    record = session.get(PresetRecord, preset_id)
+    if record is None:
+        return None
+    # Compacting reads the parsed commands, so the stored content itself is never loaded.
+    content = preset_merge.merge_cache.get_or_compute(
+        ("compact", record.content_hash),
+        lambda: preset_merge.compact_commands(_get_commands_by_preset(session, [preset_id])[0])
+    )
+    return Preset(**record.model_dump(include=set(Preset.model_fields)), content=content)
 
 
-def get_all_presets(limit: int = 128) -> List[Preset]:
+def get_compact_preset(preset_id: int) -> Preset | None:
     with Session(engine) as session:
-        statement = select(Preset).limit(limit)
-        return list(session.exec(statement).all())
+        return _get_compact_preset(session, preset_id)
+
+
+def _get_presets(session: Session, preset_ids: Sequence[int]) -> Dict[int, Preset]:
+    records = session.exec(select(PresetRecord).where(PresetRecord.id.in_(set(preset_ids)))).all()
+    return {preset.id: preset for preset in _with_content(session, records)}
+
+
+def get_presets(preset_ids: Sequence[int]) -> Dict[int, Preset]:
+    with Session(engine) as session:
+        return _get_presets(session, preset_ids)
+
+
+def _get_page(session: Session, model: Type[ModelT], after: int | None, limit: int, filters: Sequence[ColumnElement] = ()) -> List[ModelT]:
+    # Keyset pagination on the primary key: every page is an index range scan, however deep.
+    statement = select(model).where(*filters).order_by(model.id).limit(limit)
+    if after is not None:
+        statement = statement.where(model.id > after)
+    return list(session.exec(statement).all())
+
+
+def _iter_pages(session: Session, model: Type[ModelT], after: int | None, batch_size: int, filters: Sequence[ColumnElement] = ()) -> Iterator[List[ModelT]]:
+    while True:
+        page = _get_page(session, model, after, batch_size, filters)
+        if page:
+            yield page
+        if len(page) < batch_size:
+            return
+        after = page[-1].id
+
+
+def _iter_all(session: Session, model: Type[ModelT], after: int | None, batch_size: int, filters: Sequence[ColumnElement] = ()) -> Iterator[ModelT]:
+    for page in _iter_pages(session, model, after, batch_size, filters):
+        yield from page
+
+
+def _get_presets_page(session: Session, after: int | None, limit: int, filters: Sequence[ColumnElement] = ()) -> List[Preset]:
+    return _with_content(session, _get_page(session, PresetRecord, after, limit, filters))
+
+
+def _get_preset_rows_page(session: Session, after: int | None, limit: int, filters: Sequence[ColumnElement] = ()) -> List[dict]:
+    # Plain dicts in the field order of Preset, for fast_json; no model is built per row.
+    statement = (
+        select(PresetRecord.id, PresetRecord.name, PresetRecord.description, PresetRecord.tags,
+               PresetRecord.author, PresetRecord.content_hash)
+        .where(*filters).order_by(PresetRecord.id).limit(limit)
+    )
+    if after is not None:
+        statement = statement.where(PresetRecord.id > after)
+    rows = session.exec(statement).all()
+    contents = content_store.load_contents(session.connection(), [row.content_hash for row in rows])
+    return [{
+        "id": row.id,
+        "name": row.name,
+        "description": row.description,
+        "tags": row.tags,
+        "author": row.author,
+        "content": contents[row.content_hash]
+    } for row in rows]
+
+
+def _iter_metadata_rows(session: Session, batch_size: int) -> Iterator[dict]:
+    # Plain dicts in the field order of PresetMetadata, for fast_json.
+    statement = (
+        select(PresetRecord.id, PresetRecord.name, PresetRecord.description, PresetRecord.author, PresetRecord.tags)
+        .order_by(PresetRecord.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in session.exec(statement):
+        yield {"id": row.id, "name": row.name, "description": row.description, "author": row.author, "tags": row.tags}
+
+
+def preset_filters(tags: Sequence[str] = (), match_all_tags: bool = True, author: str | None = None,
+                   sets: Sequence[str] = ()) -> List[ColumnElement]:
+    """
+    Builds the WHERE clauses for filtering presets by tags, author and the settings they set.
+
+    Args:
+        tags (Sequence[str]): Tags to filter by. No tags means no tag filter.
+        match_all_tags (bool): Whether a preset needs all tags (AND) or any of them (OR).
+        author (str | None): Only return presets of this author.
+        sets (Sequence[str]): Only return presets setting all of these, e.g. `thr_expo` or `adjrange 2`.
+    """
+    filters = []
+    tags = set(tags)
+    if tags:
+        tagged = select(PresetTag.preset_id).where(PresetTag.tag.in_(tags))
+        if match_all_tags:
+            tagged = tagged.group_by(PresetTag.preset_id).having(func.count() == len(tags))
+        filters.append(PresetRecord.id.in_(tagged))
+    if author is not None:
+        filters.append(PresetRecord.author == author)
+    sets = {name.strip().lower() for name in sets}
+    if sets:
+        # A preset may set the same name once per profile, hence the distinct count.
+        setting = (
+            select(PresetCommand.preset_id).where(PresetCommand.name.in_(sets))
+            .group_by(PresetCommand.preset_id).having(func.count(PresetCommand.name.distinct()) == len(sets))
+        )
+        filters.append(PresetRecord.id.in_(setting))
+    return filters
+
+
+def get_presets_page(after: int | None = None, limit: int = 128, filters: Sequence[ColumnElement] = ()) -> List[Preset]:
+    with Session(engine) as session:
+        return _get_presets_page(session, after, limit, filters)
+
+
+def iter_all_presets(after: int | None = None, batch_size: int = 500, filters: Sequence[ColumnElement] = ()) -> Iterator[Preset]:
+    with Session(engine) as session:
+        for page in _iter_pages(session, PresetRecord, after, batch_size, filters):
+            yield from _with_content(session, page)
+
+
+def get_all_presets() -> List[Preset]:
+    return list(iter_all_presets())
+
+
+def _index_presets(connection: Connection, presets: Sequence[Preset]):
+    connection.execute(
+        text(f"INSERT INTO {PRESET_FTS_TABLE}(rowid, name, description, content) "
+             "VALUES (:id, :name, :description, :content)"),
+        [{"id": p.id, "name": p.name, "description": p.description, "content": p.content} for p in presets]
+    )
+
+
+def _unindex_presets(connection: Connection, presets: Sequence[Preset]):
+    # The index is contentless: an entry is removed by passing the texts it was indexed with.
+    connection.execute(
+        text(f"INSERT INTO {PRESET_FTS_TABLE}({PRESET_FTS_TABLE}, rowid, name, description, content) "
+             "VALUES ('delete', :id, :name, :description, :content)"),
+        [{"id": p.id, "name": p.name, "description": p.description, "content": p.content} for p in presets]
+    )
+
+
+def _fts_query(query: str) -> str:
+    # Quote every term so user input is never parsed as FTS5 query syntax; terms are ANDed.
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def search_filter_statement(search_filter: SearchFilter) -> Select:
+    """
+    Compiles a saved SearchFilter into a query for the ids of the presets it matches.
+
+    It matches what the extension shows for the filter: the search query has to be part of the
+    preset name and the author has to be the preset's, both ignoring case, and the preset needs
+    all tags. The author and tags use their indexes; names are only compared on the rows those
+    leave. Empty fields do not filter.
+
+    Args:
+        search_filter (SearchFilter): The filter to compile.
+    """
+    filters = preset_filters(tags=search_filter.tags or [])
+    if search_filter.author:
+        filters.append(func.lower(PresetRecord.author) == search_filter.author.lower())
+    if search_filter.search_query:
+        filters.append(func.instr(func.lower(PresetRecord.name), search_filter.search_query.lower()) > 0)
+    return select(PresetRecord.id).where(*filters).order_by(PresetRecord.id)
+
+
+def _get_matching_ids(session: Session, statement: Select, preset_ids: Sequence[int] | None = None) -> List[int]:
+    if preset_ids is not None:
+        statement = statement.where(PresetRecord.id.in_(preset_ids))
+    return list(session.exec(statement))
+
+
+def _search_presets(session: Session, query: str, limit: int = 20, offset: int = 0) -> List[PresetSearchHit]:
+    match = _fts_query(query)
+    if not match:
+        return []
+
+    # Matches in the name weigh more than in the description, which weigh more than in the content.
+    statement = text(
+        "SELECT preset.id, preset.name, preset.description, preset.author, preset.tags, "
+        f"preset.content_hash, bm25({PRESET_FTS_TABLE}, 10.0, 5.0, 1.0) AS rank "
+        f"FROM {PRESET_FTS_TABLE} JOIN preset ON preset.id = {PRESET_FTS_TABLE}.rowid "
+        f"WHERE {PRESET_FTS_TABLE} MATCH :match "
+        "ORDER BY rank LIMIT :limit OFFSET :offset"
+    )
+    rows = session.connection().execute(statement, {"match": match, "limit": limit, "offset": offset}).all()
+    # The index keeps no texts, so snippets are cut from the contents of the returned page only.
+    contents = content_store.load_contents(session.connection(), [row.content_hash for row in rows])
+    return [PresetSearchHit(
+        id=row.id,
+        name=row.name,
+        description=row.description,
+        author=row.author,
+        tags=json.loads(row.tags) if row.tags else [],
+        rank=row.rank,
+        snippet=fts_snippet.snippet([row.name, row.description, contents[row.content_hash]], query)
+    ) for row in rows]
+
+
+def search_presets(query: str, limit: int = 20, offset: int = 0) -> List[PresetSearchHit]:
+    with Session(engine) as session:
+        return _search_presets(session, query, limit, offset)
+
+
+def _get_facets(session: Session, filters: Sequence[ColumnElement] = ()) -> Facets:
+    tag_counts = select(PresetTag.tag, func.count()).group_by(PresetTag.tag).order_by(PresetTag.tag)
+    if filters:
+        matching = select(PresetRecord.id).where(*filters)
+        tag_counts = tag_counts.where(PresetTag.preset_id.in_(matching))
+        author_counts = (
+            select(PresetRecord.author, func.count()).where(*filters)
+            .group_by(PresetRecord.author).order_by(PresetRecord.author)
+        )
+    else:
+        author_counts = select(Author.name, Author.preset_count).order_by(Author.name)
+
+    return Facets(
+        tags=[FacetCount(value=tag, count=count) for tag, count in session.exec(tag_counts)],
+        authors=[FacetCount(value=author, count=count) for author, count in session.exec(author_counts)]
+    )
+
+
+def get_facets(filters: Sequence[ColumnElement] = ()) -> Facets:
+    with Session(engine) as session:
+        return _get_facets(session, filters)
+
+
+def _record(preset: Preset, content_hash: str, revision: int) -> dict:
+    return {
+        **preset.model_dump(exclude={"id", "content"}),
+        "content_hash": content_hash,
+        "revision": revision,
+        "updated_at": datetime.now(timezone.utc)
+    }
+
+
+def _clear_tombstones(connection: Connection, preset_ids: Sequence[int]):
+    # SQLite may hand out the id of a deleted preset again.
+    connection.execute(delete(PresetTombstone).where(PresetTombstone.preset_id.in_(preset_ids)))
+
+
+def _create_preset(session: Session, preset: Preset) -> Preset:
+    revision = _bump_revision(session)
+    [content_hash] = content_store.store_contents(session.connection(), [preset.content])
+    record = PresetRecord(**_record(preset, content_hash, revision))
+    session.add(record)
+    session.flush()
+    preset = preset.model_copy(update={"id": record.id})
+    _index_presets(session.connection(), [preset])
+    betaflight_cli.index_commands(session.connection(), [preset])
+    _clear_tombstones(session.connection(), [record.id])
+    session.commit()
+    return preset
 
 
 def create_preset(preset: Preset) -> Preset:
     with Session(engine) as session:
-        session.add(preset)
-        session.commit()
-        session.refresh(preset)
-        return preset
+        return _create_preset(session, preset)
+
+
+def _without_stored_contents(connection: Connection, presets: List[Preset], revision: int | None) -> List[Preset]:
+    # Only presets written before this import count; duplicates within the import are kept. Until
+    # the import has written a preset (revision is None), every stored preset is older.
+    content_hashes = [content_store.content_hash(p.content) for p in presets]
+    statement = select(PresetRecord.content_hash).where(PresetRecord.content_hash.in_(set(content_hashes)))
+    if revision is not None:
+        statement = statement.where(PresetRecord.revision < revision)
+    stored = set(connection.execute(statement).scalars())
+    return [p for p, content_hash in zip(presets, content_hashes) if content_hash not in stored]
+
+
+COMMAND_NAME_INDEX = next(
+    index for index in PresetCommand.__table__.indexes if index.name == "ix_preset_command_name_preset_id"
+)
+
+
+def _index_revision(connection: Connection, revision: int):
+    # _index_presets and add_to_tag_index for every preset written at a revision, in bulk.
+    content_store.register_sql_functions(connection)
+    connection.execute(text(
+        f"INSERT INTO {PRESET_FTS_TABLE}(rowid, name, description, content) "
+        "SELECT preset.id, preset.name, preset.description, "
+        "decompress_content(content_blob.codec, content_blob.data, content_dictionary.data) "
+        "FROM preset JOIN content_blob ON content_blob.hash = preset.content_hash "
+        "LEFT JOIN content_dictionary ON content_dictionary.id = content_blob.dictionary_id "
+        "WHERE preset.revision = :revision"
+    ), {"revision": revision})
+    add_revision_to_tag_index(connection, revision)
+
+
+def _create_presets(session: Session, presets: Iterable[Preset], batch_size: int = 500, skip_stored: bool = False,
+                    defer_indexes: bool = False) -> List[int]:
+    ids: List[int] = []
+    presets = iter(presets)
+    connection = session.connection()
+    revision = None
+    if defer_indexes:
+        # Building the index once from all rows is cheaper than updating it row by row.
+        COMMAND_NAME_INDEX.drop(connection)
+    while batch := list(itertools.islice(presets, batch_size)):
+        if skip_stored:
+            batch = _without_stored_contents(connection, batch, revision)
+            if not batch:
+                continue
+        # All presets of one import share the revision of its transaction.
+        revision = revision or _bump_revision(session)
+        content_hashes = content_store.store_contents(connection, [p.content for p in batch])
+        # The transaction holds the write lock, so the ids SQLite would hand out are known up front.
+        # RETURNING them in input order instead makes SQLAlchemy insert row by row.
+        first_id = (connection.execute(select(func.max(PresetRecord.id))).scalar() or 0) + 1
+        batch_ids = list(range(first_id, first_id + len(batch)))
+        rows = [{"id": preset_id, **_record(p, content_hash, revision)}
+                for preset_id, p, content_hash in zip(batch_ids, batch, content_hashes)]
+        connection.execute(insert(PresetRecord), rows)
+        for preset, preset_id in zip(batch, batch_ids):
+            preset.id = preset_id
+        # Command rows come from parsing the contents, which are at hand only here.
+        betaflight_cli.index_commands(connection, batch)
+        if not defer_indexes:
+            _index_presets(connection, batch)
+            add_to_tag_index(connection, batch)
+        _clear_tombstones(connection, batch_ids)
+        ids.extend(batch_ids)
+    if defer_indexes:
+        if revision is not None:
+            _index_revision(connection, revision)
+        COMMAND_NAME_INDEX.create(connection)
+    session.commit()
+    return ids
+
+
+def create_presets(presets: Iterable[Preset], batch_size: int = 500, skip_stored: bool = False,
+                   defer_indexes: bool = False) -> List[int]:
+    """
+    Inserts many presets in a single transaction and returns their ids in input order.
+
+    Rows are written batch by batch with one multi-row INSERT each, bypassing the ORM unit of
+    work, so the search, command and tag indexes are filled here explicitly.
+
+    Args:
+        presets (Iterable[Preset]): The presets to insert. May be a lazy iterator.
+        batch_size (int): Number of presets inserted per statement.
+        skip_stored (bool): Skip presets whose content is already stored in another preset, so
+            repeating an import adds nothing. Only the created presets' ids are returned.
+        defer_indexes (bool): Fill the search and tag indexes with one statement each after all
+            rows are written, and rebuild the command name index then. Faster for large loads
+            such as seeding; the indexes are complete when the transaction commits either way.
+    """
+    with Session(engine) as session:
+        return _create_presets(session, presets, batch_size, skip_stored, defer_indexes)
+
+
+def _update_preset(session: Session, preset_id: int, preset: Preset) -> Preset | None:
+    record = session.get(PresetRecord, preset_id)
+    if record is None:
+        return None
+
+    revision = _bump_revision(session)
+    [stored] = _with_content(session, [record])
+    stored_hash = record.content_hash
+    [content_hash] = content_store.store_contents(session.connection(), [preset.content])
+    record_content_changed = content_hash != stored_hash
+    for key, value in _record(preset, content_hash, revision).items():
+        setattr(record, key, value)
+    session.add(record)
+    session.flush()
+    preset = preset.model_copy(update={"id": preset_id})
+    _unindex_presets(session.connection(), [stored])
+    _index_presets(session.connection(), [preset])
+    if record_content_changed:
+        betaflight_cli.unindex_commands(session.connection(), preset_id)
+        betaflight_cli.index_commands(session.connection(), [preset])
+        content_store.delete_unreferenced(session.connection(), [stored_hash])
+    session.commit()
+    return preset
+
+
+def update_preset(preset_id: int, preset: Preset) -> Preset | None:
+    with Session(engine) as session:
+        return _update_preset(session, preset_id, preset)
+
+
+def _delete_preset(session: Session, preset_id: int) -> bool:
+    record = session.get(PresetRecord, preset_id)
+    if record is None:
+        return False
+
+    revision = _bump_revision(session)
+    [stored] = _with_content(session, [record])
+    stored_hash = record.content_hash
+    session.delete(record)
+    session.merge(PresetTombstone(preset_id=preset_id, revision=revision))
+    session.flush()
+    _unindex_presets(session.connection(), [stored])
+    betaflight_cli.unindex_commands(session.connection(), preset_id)
+    content_store.delete_unreferenced(session.connection(), [stored_hash])
+    session.commit()
+    return True
+
+
+def delete_preset(preset_id: int) -> bool:
+    with Session(engine) as session:
+        return _delete_preset(session, preset_id)
+
+
+def _get_commands(session: Session, preset_id: int) -> List[CliCommand] | None:
+    if session.get(PresetRecord, preset_id) is None:
+        return None
+    statement = select(PresetCommand).where(PresetCommand.preset_id == preset_id).order_by(PresetCommand.line)
+    return [CliCommand.model_validate(command, from_attributes=True) for command in session.exec(statement)]
+
+
+def get_commands(preset_id: int) -> List[CliCommand] | None:
+    with Session(engine) as session:
+        return _get_commands(session, preset_id)
+
+
+def _get_content_hashes(session: Session, preset_ids: Sequence[int]) -> List[str] | None:
+    statement = select(PresetRecord.id, PresetRecord.content_hash).where(PresetRecord.id.in_(set(preset_ids)))
+    content_hashes = dict(session.exec(statement).all())
+    if not all(preset_id in content_hashes for preset_id in preset_ids):
+        return None
+    return [content_hashes[preset_id] for preset_id in preset_ids]
+
+
+def _get_commands_by_preset(session: Session, preset_ids: Sequence[int]) -> List[List[CliCommand]]:
+    statement = (
+        select(PresetCommand).where(PresetCommand.preset_id.in_(set(preset_ids)))
+        .order_by(PresetCommand.preset_id, PresetCommand.line)
+    )
+    commands: Dict[int, List[CliCommand]] = {}
+    for command in session.exec(statement):
+        commands.setdefault(command.preset_id, []).append(CliCommand.model_validate(command, from_attributes=True))
+    return [commands.get(preset_id, []) for preset_id in preset_ids]
+
+
+def _merge_presets(session: Session, preset_ids: Sequence[int]) -> PresetMerge | None:
+    content_hashes = _get_content_hashes(session, preset_ids)
+    if content_hashes is None:
+        return None
+    merge = preset_merge.merge_cache.get_or_compute(
+        ("merge", *content_hashes),
+        lambda: preset_merge.merge_commands(_get_commands_by_preset(session, preset_ids))
+    )
+    return preset_merge.with_ids(merge, preset_ids)
+
+
+def merge_presets(preset_ids: Sequence[int]) -> PresetMerge | None:
+    with Session(engine) as session:
+        return _merge_presets(session, preset_ids)
+
+
+def _diff_presets(session: Session, a: int, b: int) -> PresetDiff | None:
+    content_hashes = _get_content_hashes(session, [a, b])
+    if content_hashes is None:
+        return None
+    diff = preset_merge.merge_cache.get_or_compute(
+        ("diff", *content_hashes),
+        lambda: preset_merge.diff_commands(*_get_commands_by_preset(session, [a, b]))
+    )
+    return preset_merge.with_ids(diff, [a, b])
+
+
+def diff_presets(a: int, b: int) -> PresetDiff | None:
+    with Session(engine) as session:
+        return _diff_presets(session, a, b)
+
+
+def _changed_records(session: Session, since: int) -> Tuple[List[PresetRecord], List[int]]:
+    changed = session.exec(
+        select(PresetRecord).where(PresetRecord.revision > since).order_by(PresetRecord.id)
+    )
+    deleted = session.exec(
+        select(PresetTombstone.preset_id).where(PresetTombstone.revision > since).order_by(PresetTombstone.preset_id)
+    )
+    return list(changed), list(deleted)
+
+
+def _get_changes(session: Session, since: int) -> PresetChanges:
+    revision, (changed, deleted) = _read_with_revision(session, _changed_records, since)
+    return PresetChanges(
+        revision=revision,
+        changed=[PresetMetadata(
+            id=p.id,
+            name=p.name,
+            description=p.description,
+            author=p.author,
+            tags=p.tags
+        ) for p in changed],
+        deleted=deleted
+    )
+
+
+def _changed_ids(session: Session, since: int) -> Tuple[List[int], List[int]]:
+    changed = session.exec(select(PresetRecord.id).where(PresetRecord.revision > since))
+    deleted = session.exec(select(PresetTombstone.preset_id).where(PresetTombstone.revision > since))
+    return list(changed), list(deleted)
+
+
+def _get_changed_ids(session: Session, since: int) -> Tuple[int, List[int], List[int]]:
+    # The ids only of what _get_changes returns: the revision, changed and deleted presets.
+    revision, (changed, deleted) = _read_with_revision(session, _changed_ids, since)
+    return revision, changed, deleted
+
+
+def get_changes(since: int) -> PresetChanges:
+    with Session(engine) as session:
+        return _get_changes(session, since)
+
+
+def _get_search_filter(session: Session, filter_id: int) -> SearchFilter | None:
+    return session.get(SearchFilter, filter_id)
 
 
 def get_search_filter(filter_id: int) -> SearchFilter | None:
     with Session(engine) as session:
-        return session.get(SearchFilter, filter_id)
+        return _get_search_filter(session, filter_id)
+
+
+def get_search_filters_page(after: int | None = None, limit: int = 128) -> List[SearchFilter]:
+    with Session(engine) as session:
+        return _get_page(session, SearchFilter, after, limit)
 
 
-def get_all_search_filters(limit: int = 128) -> List[SearchFilter]:
+def iter_all_search_filters(after: int | None = None, batch_size: int = 500) -> Iterator[SearchFilter]:
     with Session(engine) as session:
-        statement = select(SearchFilter).limit(limit)
-        return list(session.exec(statement).all())
+        yield from _iter_all(session, SearchFilter, after, batch_size)
+
+
+def get_all_search_filters() -> List[SearchFilter]:
+    return list(iter_all_search_filters())
@@ -1,11 +1,190 @@
+from sqlalchemy import Connection, Engine, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.schema import CreateIndex
 from sqlmodel import create_engine, SQLModel
 
+import betaflight_cli
+import content_store
+import query_profiler
 from config import config
+from models import Preset
 
 DATABASE_URL = f"sqlite:///{config['database']['filename']}"
 
-engine = create_engine(DATABASE_URL, echo=True)
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{config['database']['filename']}"
+
+ECHO = config["database"]["echo"]
+PERFORMANCE = config["database"]["performance"]
+
+
+def apply_performance_pragmas(engine: Engine):
+    """
+    Applies the pragmas from database.performance in config.yaml to every new pooled connection.
+
+    WAL lets readers proceed while a writer commits, so catalog reads never queue behind imports.
+    """
+    pragmas = {
+        "journal_mode": PERFORMANCE["journal_mode"],
+        "synchronous": PERFORMANCE["synchronous"],
+        "cache_size": PERFORMANCE["cache_size"],
+        "mmap_size": PERFORMANCE["mmap_size"],
+        "busy_timeout": PERFORMANCE["busy_timeout"],
+    }
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def pool_options() -> dict:
+    # A fixed set of long-lived connections keeps the page cache and mmap warm between requests.
+    return {
+        "pool_size": PERFORMANCE["pool_size"],
+        "max_overflow": PERFORMANCE["max_overflow"],
+        "pool_pre_ping": False,
+    }
+
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=ECHO,
+    poolclass=QueuePool,
+    connect_args={"check_same_thread": False},
+    **pool_options()
+)
+apply_performance_pragmas(engine)
+if query_profiler.ENABLED:
+    query_profiler.install(engine)
+
+_async_engine: AsyncEngine | None = None
+
+
+def get_async_engine() -> AsyncEngine:
+    # Created on first use, so aiosqlite is only needed when the async mode is used.
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            echo=ECHO,
+            poolclass=AsyncAdaptedQueuePool,
+            **pool_options()
+        )
+        apply_performance_pragmas(_async_engine.sync_engine)
+        if query_profiler.ENABLED:
+            query_profiler.install(_async_engine.sync_engine)
+    return _async_engine
+
+
+# Full-text index over the searchable preset columns. The rowid of every entry is the preset id;
+# entries are written by crud.py in the same transaction as the preset itself. The index is
+# contentless: the texts live compressed in the content store only, so entries are removed with
+# FTS5's 'delete' command and the texts they were indexed with.
+PRESET_FTS_TABLE = "preset_fts"
+
+
+def create_search_index(connection: Connection):
+    definition = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": PRESET_FTS_TABLE}
+    ).scalar()
+    if definition is not None and "content=''" in definition:
+        return
+    if definition is not None:
+        # Indexes created before it was contentless keep a copy of every text; rebuild them.
+        connection.execute(text(f"DROP TABLE {PRESET_FTS_TABLE}"))
+
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE {PRESET_FTS_TABLE} USING fts5(name, description, content, content='')"
+    ))
+    # Index presets that were stored before the search index existed.
+    rows = connection.execute(text("SELECT id, name, description, content_hash FROM preset"))
+    for partition in rows.partitions(1000):
+        contents = content_store.load_contents(connection, [row.content_hash for row in partition])
+        connection.execute(
+            text(f"INSERT INTO {PRESET_FTS_TABLE}(rowid, name, description, content) "
+                 "VALUES (:id, :name, :description, :content)"),
+            [{"id": row.id, "name": row.name, "description": row.description,
+              "content": contents[row.content_hash]} for row in partition]
+        )
+
+
+def migrate_inline_content(connection: Connection):
+    """
+    Moves preset contents stored inline in preset.content into the content store.
+
+    Databases created before content_blob existed keep the text in the preset table; it is
+    replaced by preset.content_hash here, once.
+    """
+    columns = {column["name"] for column in inspect(connection).get_columns("preset")}
+    if "content" not in columns:
+        return
+
+    connection.execute(text("ALTER TABLE preset ADD COLUMN content_hash VARCHAR"))
+    rows = connection.execute(text("SELECT id, content FROM preset")).all()
+    for start in range(0, len(rows), 1000):
+        batch = rows[start:start + 1000]
+        hashes = content_store.store_contents(connection, [row.content for row in batch])
+        connection.execute(
+            text("UPDATE preset SET content_hash = :content_hash WHERE id = :id"),
+            [{"id": row.id, "content_hash": h} for row, h in zip(batch, hashes)]
+        )
+    connection.execute(text("ALTER TABLE preset DROP COLUMN content"))
+
+
+def create_missing_columns(connection: Connection):
+    # create_all() does not alter existing tables; add columns declared after a table was created.
+    for table in SQLModel.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in inspect(connection).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}"))
+
+
+def create_missing_indexes(connection: Connection):
+    # create_all() only creates indexes together with their table; add those declared later.
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            # IF NOT EXISTS rather than checkfirst: SQLite reflection skips expression indexes.
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def create_tag_index(connection: Connection):
+    # Fill preset_tag and author from presets that were stored before these tables existed.
+    connection.execute(text(
+        "INSERT OR IGNORE INTO preset_tag(preset_id, tag) "
+        "SELECT preset.id, json_each.value FROM preset, json_each(preset.tags)"
+    ))
+    connection.execute(text(
+        "INSERT INTO author(name, preset_count) SELECT author, COUNT(*) FROM preset GROUP BY author"
+    ))
+
+
+def create_command_index(connection: Connection):
+    # Parse the contents of presets that were stored before preset_command existed.
+    rows = connection.execute(text("SELECT id, content_hash FROM preset"))
+    for partition in rows.partitions(1000):
+        contents = content_store.load_contents(connection, [row.content_hash for row in partition])
+        betaflight_cli.index_commands(connection, [
+            Preset(id=row.id, content=contents[row.content_hash]) for row in partition
+        ])
 
 
 def create_db_and_tables():
+    existing_tables = set(inspect(engine).get_table_names())
     SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        migrate_inline_content(connection)
+        create_missing_columns(connection)
+        create_missing_indexes(connection)
+        create_search_index(connection)
+        if "preset_tag" not in existing_tables:
+            create_tag_index(connection)
+        if "preset_command" not in existing_tables:
+            create_command_index(connection)
@@ -0,0 +1,146 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List
+
+from sqlmodel import Session
+
+import cache
+import crud
+import fast_json
+from database import create_db_and_tables, engine
+from models import PresetRecord
+
+MANIFEST = "manifest.json"
+PRESETS_DIRECTORY = "presets"
+BATCH_SIZE = 500
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _write_atomic(path: str, data: bytes):
+    # A static host must never serve a half written file.
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(data)
+    os.replace(temporary_path, path)
+
+
+def _remove(output_dir: str, name: str):
+    for suffix in ("", ".gz", ".br"):
+        path = os.path.join(output_dir, name + suffix)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def write_variants(output_dir: str, stem: str, data: bytes) -> str:
+    """
+    Writes data as <stem>.<hash>.json with gzip and, when brotli is installed, brotli variants.
+
+    Returns the file name relative to output_dir. Files that already exist are left alone: the
+    name includes the hash of the data, so they hold the same bytes.
+    """
+    name = f"{stem}.{hashlib.sha256(data).hexdigest()[:16]}.json"
+    path = os.path.join(output_dir, name)
+    if os.path.exists(path):
+        return name
+
+    _write_atomic(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    brotli = _brotli()
+    if brotli is not None:
+        _write_atomic(path + ".br", brotli.compress(data, quality=11))
+    _write_atomic(path, data)
+    return name
+
+
+def _iter_preset_rows(session: Session, preset_ids: List[int] | None) -> Iterator[dict]:
+    if preset_ids is None:
+        after = None
+        while page := crud._get_preset_rows_page(session, after, BATCH_SIZE):
+            yield from page
+            after = page[-1]["id"]
+        return
+    for start in range(0, len(preset_ids), BATCH_SIZE):
+        batch = preset_ids[start:start + BATCH_SIZE]
+        yield from crud._get_preset_rows_page(session, None, len(batch), [PresetRecord.id.in_(batch)])
+
+
+def export_static(output_dir: str = "static", full: bool = False) -> dict:
+    """
+    Exports the catalog and every preset as immutable static JSON files and writes a manifest.
+
+    The files carry the hash of their content in their name, so a static host can serve them with
+    immutable caching; only manifest.json must be revalidated. With the .gz and .br variants next
+    to them, nginx serves them precompressed (gzip_static, brotli_static). Brotli variants need
+    the brotli package.
+
+    The export is incremental: the revision in the previous manifest is passed to the delta sync,
+    and only presets changed or deleted since then are written or removed. Files the new
+    manifest no longer references are deleted after it is written.
+
+    Args:
+        output_dir (str): The directory to export to.
+        full (bool): Export every preset, even if a previous manifest exists.
+    """
+    create_db_and_tables()
+    os.makedirs(os.path.join(output_dir, PRESETS_DIRECTORY), exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    previous = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            previous = json.load(f)
+    if _brotli() is None:
+        print("brotli is not installed, only gzip variants are written: pip install brotli")
+
+    with Session(engine) as session:
+        if previous is None or full:
+            revision, rows = crud._read_with_revision(session, _iter_preset_rows, None)
+            preset_files: Dict[str, str] = {}
+            deleted_ids: List[int] = []
+        else:
+            changes = crud._get_changes(session, previous["revision"])
+            revision = changes.revision
+            rows = _iter_preset_rows(session, [p.id for p in changes.changed])
+            preset_files = dict(previous["presets"])
+            deleted_ids = changes.deleted
+
+        written = 0
+        for row in rows:
+            name = write_variants(output_dir, f"{PRESETS_DIRECTORY}/{row['id']}", fast_json.dumps(row))
+            if preset_files.get(str(row["id"])) != name:
+                preset_files[str(row["id"])] = name
+                written += 1
+        for preset_id in deleted_ids:
+            preset_files.pop(str(preset_id), None)
+
+        catalog = cache._build_catalog(session, BATCH_SIZE, revision)
+    catalog_name = write_variants(output_dir, "catalog", catalog.body)
+
+    manifest = {"revision": revision, "catalog": catalog_name, "presets": preset_files}
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode())
+
+    # Removed only once the new manifest no longer points to them.
+    stale_files = set()
+    if previous is not None:
+        stale_files = ({previous["catalog"], *previous["presets"].values()}
+                       - {catalog_name, *preset_files.values()})
+    for name in stale_files:
+        _remove(output_dir, name)
+    print(f"Exported revision {revision} to {output_dir}: {written} presets changed, removed {len(stale_files)} stale files.")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=export_static.__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="static", help="The directory to export to.")
+    parser.add_argument("--full", action="store_true", help="Export every preset, not only the changed ones.")
+    args = parser.parse_args()
+    export_static(output_dir=args.output, full=args.full)
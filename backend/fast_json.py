@@ -0,0 +1,18 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    """
+    Serializes plain dicts, lists and scalars to the same bytes Pydantic's model_dump_json() gives.
+
+    Routes returning large lists of rows use this instead of response_model validation; their
+    response_model still documents the schema. orjson is used when installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
@@ -0,0 +1,139 @@
+import bisect
+import re
+import unicodedata
+from typing import Dict, List, Sequence, Tuple
+
+# What the unicode61 tokenizer of preset_fts treats as a token: runs of letters and digits.
+# Underscores separate tokens, so `thr_mid` is the two tokens `thr` and `mid`.
+TOKEN = re.compile(r"[^\W_]+")
+
+Token = Tuple[int, int, str]
+
+
+def _fold(token: str) -> str:
+    # unicode61 folds case and removes diacritics.
+    if token.isascii():
+        return token.lower()
+    decomposed = unicodedata.normalize("NFKD", token.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[Token]:
+    if text.isascii():
+        # Folding keeps the offsets of ASCII text, so it is folded once instead of per token.
+        return [(match.start(), match.end(), match.group()) for match in TOKEN.finditer(text.lower())]
+    return [(match.start(), match.end(), _fold(match.group())) for match in TOKEN.finditer(text)]
+
+
+def _instances(tokens: Sequence[Token], phrases: Sequence[List[str]]) -> List[Tuple[int, int, int]]:
+    # (position, phrase, phrase size) of every phrase occurrence, in position order.
+    words = [token[2] for token in tokens]
+    by_first_word: Dict[str, List[int]] = {}
+    for index, phrase in enumerate(phrases):
+        by_first_word.setdefault(phrase[0], []).append(index)
+    instances = []
+    for position, word in enumerate(words):
+        for index in by_first_word.get(word, ()):
+            phrase = phrases[index]
+            if len(phrase) == 1 or words[position:position + len(phrase)] == phrase:
+                instances.append((position, index, len(phrase)))
+    return instances
+
+
+def _sentence_starts(text: str, tokens: Sequence[Token]) -> List[int]:
+    # Token 0, and every token that follows a "." or ":" and some whitespace.
+    starts = [0] if tokens else []
+    for position in range(1, len(tokens)):
+        gap = text[tokens[position - 1][1]:tokens[position][0]]
+        stripped = gap.rstrip(" \t\n\r")
+        if stripped != gap and stripped.endswith((".", ":")):
+            starts.append(position)
+    return starts
+
+
+def _score(instances, positions: Sequence[int], first: int, size: int, column_size: int) -> Tuple[int, int]:
+    # Scores the window of `size` tokens from `first`: 1000 for each phrase seen first, 1 for
+    # repeats. Also returns where the window starts once centered on its matches.
+    window = instances[bisect.bisect_left(positions, first):bisect.bisect_left(positions, first + size)]
+    if not window:
+        return 0, first
+    phrases = {phrase for _, phrase, _ in window}
+    score = 999 * len(phrases) + len(window)
+    matched_first = window[0][0]
+    matched_last = window[-1][0] + window[-1][2]
+    start = matched_first - int((size - (matched_last - matched_first)) / 2)
+    if start + size > column_size:
+        start = column_size - size
+    return score, max(start, 0)
+
+
+def snippet(texts: Sequence[str], query: str, open_mark: str = "[", close_mark: str = "]",
+            ellipsis: str = "...", size: int = 12) -> str:
+    """
+    Returns the part of the texts that best matches a search query, as FTS5's snippet() does.
+
+    preset_fts is contentless, so snippet() has no text to work on; this follows its algorithm
+    on the texts of one row. The window of `size` tokens with the most distinct matching terms
+    wins; windows starting a sentence, and most of all the text, get a bonus. Matches are put
+    between `open_mark` and `close_mark`, and cut ends are marked with `ellipsis`.
+
+    Args:
+        texts (Sequence[str]): The indexed columns of the row, in index order.
+        query (str): The search query; each whitespace-separated term is one phrase.
+        size (int): Number of tokens in the snippet.
+    """
+    phrases = [words for words in ([token[2] for token in tokenize(term)] for term in query.split()) if words]
+
+    best_score, best_column, best_start, best_column_size = 0, 0, 0, 0
+    columns = []
+    for column, text in enumerate(texts):
+        tokens = tokenize(text)
+        instances = _instances(tokens, phrases)
+        columns.append((tokens, instances))
+        positions = [position for position, _, _ in instances]
+        sentence_starts = _sentence_starts(text, tokens)
+        for position in positions:
+            score, start = _score(instances, positions, position, size, len(tokens))
+            if score > best_score:
+                best_score, best_column, best_start, best_column_size = score, column, start, len(tokens)
+            if sentence_starts and len(tokens) > size:
+                sentence = sentence_starts[bisect.bisect_right(sentence_starts, position) - 1]
+                if sentence < position:
+                    score, _ = _score(instances, positions, sentence, size, len(tokens))
+                    score += 120 if sentence == 0 else 100
+                    if score > best_score:
+                        best_score, best_column, best_start, best_column_size = score, column, sentence, len(tokens)
+
+    text = texts[best_column]
+    tokens, instances = columns[best_column]
+    end = best_start + size - 1
+    # Overlapping matches are highlighted as one; those starting before the window are skipped.
+    highlights: List[List[int]] = []
+    for position, _, phrase_size in instances:
+        if highlights and position <= highlights[-1][1]:
+            highlights[-1][1] = max(highlights[-1][1], position + phrase_size - 1)
+        else:
+            highlights.append([position, position + phrase_size - 1])
+    highlights = [highlight for highlight in highlights if highlight[0] >= best_start]
+
+    parts = [ellipsis] if best_start > 0 else []
+    offset = tokens[best_start][0] if best_start > 0 and best_start < len(tokens) else 0
+    highlight = 0
+    for position in range(best_start, min(end + 1, len(tokens))):
+        token_start, token_end, _ = tokens[position]
+        if highlight < len(highlights) and position == highlights[highlight][0]:
+            parts.append(text[offset:token_start])
+            parts.append(open_mark)
+            offset = token_start
+        if highlight < len(highlights) and position == highlights[highlight][1]:
+            parts.append(text[offset:token_end])
+            parts.append(close_mark)
+            offset = token_end
+            highlight += 1
+        if position == end:
+            parts.append(text[offset:token_end])
+            offset = token_end
+            if highlight < len(highlights) and highlights[highlight][0] <= position:
+                parts.append(close_mark)
+    parts.append(text[offset:] if end >= best_column_size - 1 else ellipsis)
+    return "".join(parts)
@@ -1,13 +1,25 @@
 import itertools
-from typing import List
+from typing import AsyncIterable, AsyncIterator, List, Literal, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response, StreamingResponse
 
+import async_crud
+import bitmap_index
+import bulk_import
 import crud
+import fast_json
+import metrics
+import query_profiler
+import snapshot
+from single_flight import SingleFlight
+from cache import catalog_cache, search_filter_results_cache
+from config import config
 from database import create_db_and_tables
-from models import Preset, PresetMetadata, SearchFilter, PresetsCatalog
+from revision_watcher import revision_watcher
+from models import BulkImportResult, CliCommand, QueryProfile, Facets, Preset, PresetBatchItem, PresetChanges, PresetDiff, PresetFilterResult, PresetMerge, PresetSearchHit, SearchFilter, SearchFilterResults, PresetsCatalog
 
 app = FastAPI()
 
@@ -18,12 +30,93 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["Link"],  # Pagination cursor
 )
+app.add_middleware(metrics.MetricsMiddleware)
+if query_profiler.ENABLED:
+    app.add_middleware(query_profiler.QueryProfilerMiddleware)
+
+DEFAULT_LIMIT = config["pagination"]["default_limit"]
+MAX_LIMIT = config["pagination"]["max_limit"]
+STREAM_BATCH_SIZE = config["pagination"]["stream_batch_size"]
+MAX_BATCH_IDS = config["pagination"]["max_batch_ids"]
+IMPORT_BATCH_SIZE = config["bulk_import"]["batch_size"]
+MAX_IMPORT_BATCH_SIZE = config["bulk_import"]["max_batch_size"]
+MAX_MERGE_IDS = config["merge"]["max_ids"]
+
+catalog_flight = SingleFlight("catalog")
+preset_flight = SingleFlight("preset")
+
+LimitQuery = Query(default=DEFAULT_LIMIT, ge=1, le=MAX_LIMIT)
+# Ids start at 1, so a negative keyset position is never meaningful.
+AfterQuery = Query(default=None, ge=0)
+TagsQuery = Query(default=[])
+SetsQuery = Query(default=[])
+
+
+def set_next_page_link(request: Request, response: Response, last_id: int | None, page_size: int, limit: int):
+    # A full page means there may be more rows; the client follows the Link header until it is absent.
+    if last_id is not None and page_size == limit:
+        next_url = request.url.include_query_params(after=last_id, limit=limit)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+
+def json_response(content) -> Response:
+    # Bypasses response_model validation; the route's response_model still documents the schema.
+    return Response(content=fast_json.dumps(content), media_type="application/json")
+
+
+def encode_item(item) -> bytes:
+    return fast_json.dumps(item) if isinstance(item, dict) else item.model_dump_json().encode()
+
+
+async def stream_json_array(items: AsyncIterable) -> AsyncIterator[bytes]:
+    yield b"["
+    chunk = []
+    first = True
+    async for item in items:
+        chunk.append(encode_item(item))
+        if len(chunk) == STREAM_BATCH_SIZE:
+            yield (b"" if first else b",") + b",".join(chunk)
+            chunk = []
+            first = False
+    if chunk:
+        yield (b"" if first else b",") + b",".join(chunk)
+    yield b"]"
 
 
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    if snapshot.ENABLED:
+        if revision_watcher.interval <= 0:
+            raise ValueError("database.snapshot needs invalidation.poll_interval_ms > 0 to follow writes")
+        snapshot.load()
+    if config["bitmap_index"]["build_at_startup"]:
+        bitmap_index.build_index()
+
+
+@app.on_event("startup")
+async def start_revision_watcher():
+    # Caches derived from the presets are refreshed as soon as any worker writes, after the
+    # snapshot they read from.
+    if snapshot.ENABLED:
+        revision_watcher.subscribe(snapshot.refresh)
+    revision_watcher.subscribe(catalog_cache.refresh)
+    if config["bitmap_index"]["build_at_startup"]:
+        revision_watcher.subscribe(bitmap_index.preset_bitmaps.refresh)
+    await revision_watcher.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if query_profiler.ENABLED and query_profiler.DUMP_FILE:
+        query_profiler.dump(query_profiler.DUMP_FILE)
+
+
+@app.on_event("shutdown")
+async def stop_revision_watcher():
+    await revision_watcher.stop()
 
 
 @app.get("/ping", operation_id="get_ping")
@@ -33,46 +126,179 @@ def ping():
     return {"app_name": "BFQuickLoad", "version": version}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/queries", response_model=QueryProfile, include_in_schema=False)
+def read_query_profile(reset: bool = False):
+    if not query_profiler.ENABLED:
+        raise HTTPException(status_code=404, detail="The query profiler is disabled")
+    profile = query_profiler.get_profile()
+    if reset:
+        query_profiler.reset()
+    return profile
+
+
 @app.get("/")
 def read_root():
     return RedirectResponse(url="/docs")
 
 
 @app.get("/presets/catalog", response_model=PresetsCatalog, operation_id="get_presets_catalog")
-def read_catalog():
-    presets = crud.get_all_presets()
-
-    return PresetsCatalog(
-        presets_metadata=[PresetMetadata(
-            id = p.id,
-            name = p.name,
-            description = p.description,
-            author=p.author,
-            tags = p.tags
-        ) for p in presets],
-        authors=sorted(list(set([p.author for p in presets]))),
-        tags=sorted(list(set(itertools.chain(*[p.tags for p in presets]))))
-    )
+async def read_catalog(request: Request, after: Optional[int] = AfterQuery, limit: Optional[int] = Query(default=None, ge=1, le=MAX_LIMIT)):
+    if after is None and limit is None:
+        return Response(content=await catalog_flight.do(None, catalog_cache.get), media_type="application/json")
+
+    limit = limit or DEFAULT_LIMIT
+    body, ids = await catalog_flight.do((after, limit), lambda: catalog_cache.get_page(after=after, limit=limit))
+    page_response = Response(content=body, media_type="application/json")
+    set_next_page_link(request, page_response, ids[-1] if ids else None, len(ids), limit)
+    return page_response
 
 
 @app.get("/presets", response_model=List[Preset], operation_id="get_all_presets")
-def read_presets():
-    return crud.get_all_presets()
+async def read_presets(request: Request, after: Optional[int] = AfterQuery, limit: int = LimitQuery, stream: bool = False,
+                 tags: List[str] = TagsQuery, tag_mode: Literal["and", "or"] = "and", author: Optional[str] = None, sets: List[str] = SetsQuery):
+    filters = crud.preset_filters(tags=tags, match_all_tags=tag_mode == "and", author=author, sets=sets)
+    if stream:
+        presets = async_crud.iter_all_preset_rows(after=after, batch_size=STREAM_BATCH_SIZE, filters=filters)
+        return StreamingResponse(stream_json_array(presets), media_type="application/json")
+
+    presets = await async_crud.get_preset_rows_page(after=after, limit=limit, filters=filters)
+    presets_response = json_response(presets)
+    set_next_page_link(request, presets_response, presets[-1]["id"] if presets else None, len(presets), limit)
+    return presets_response
+
+
+@app.get("/presets/batch", response_model=List[PresetBatchItem], operation_id="get_presets_batch")
+async def read_presets_batch(ids: List[int] = Query(min_length=1, max_length=MAX_BATCH_IDS)):
+    presets = await async_crud.get_presets(ids)
+    return [PresetBatchItem(id=preset_id, found=preset_id in presets, preset=presets.get(preset_id)) for preset_id in ids]
+
+
+@app.get("/presets/changes", response_model=PresetChanges, operation_id="get_preset_changes")
+async def read_preset_changes(since: int = Query(ge=0)):
+    return await async_crud.get_changes(since=since)
+
+
+@app.get("/presets/search", response_model=List[PresetSearchHit], operation_id="search_presets")
+async def search_presets(request: Request, response: Response, q: str = Query(min_length=1), offset: int = Query(default=0, ge=0), limit: int = LimitQuery):
+    hits = await async_crud.search_presets(query=q, limit=limit, offset=offset)
+    if len(hits) == limit:
+        next_url = request.url.include_query_params(offset=offset + limit, limit=limit)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return hits
+
+
+@app.get("/presets/filter", response_model=PresetFilterResult, operation_id="filter_presets")
+async def filter_presets(request: Request, q: str = Query(min_length=1), after: Optional[int] = AfterQuery, limit: int = LimitQuery):
+    # q combines tag:<tag> and author:<author> terms with AND, OR, NOT and parentheses.
+    index = bitmap_index.preset_bitmaps
+    await index.refresh()
+    try:
+        bits = index.query(q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    ids = list(itertools.islice(bitmap_index.iter_ids(bits, after), limit))
+    filter_response = json_response({"revision": index.revision, "count": bits.bit_count(), "ids": ids})
+    set_next_page_link(request, filter_response, ids[-1] if ids else None, len(ids), limit)
+    return filter_response
+
+
+@app.get("/presets/merge", response_model=PresetMerge, operation_id="merge_presets")
+async def merge_presets(ids: List[int] = Query(min_length=1, max_length=MAX_MERGE_IDS)):
+    merge = await async_crud.merge_presets(ids)
+    if merge is None:
+        raise HTTPException(status_code=404, detail="Preset not found")
+    return merge
+
+
+@app.get("/presets/diff", response_model=PresetDiff, operation_id="diff_presets")
+async def diff_presets(a: int, b: int):
+    diff = await async_crud.diff_presets(a, b)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Preset not found")
+    return diff
+
+
+@app.post("/presets/bulk", response_model=BulkImportResult, operation_id="create_presets_bulk", openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/x-ndjson": {"schema": {"type": "string"}},
+            "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/Preset"}}},
+        },
+    },
+})
+async def create_presets_bulk(request: Request, batch_size: int = Query(default=IMPORT_BATCH_SIZE, ge=1, le=MAX_IMPORT_BATCH_SIZE)):
+    # The import runs in one transaction on a worker thread, once the whole body has arrived.
+    body = await bulk_import.spool(request.stream())
+    try:
+        documents = bulk_import.iter_documents(bulk_import.iter_chunks(body))
+        result = await run_in_threadpool(bulk_import.import_presets, documents, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        body.close()
+    # Serve the import from this worker's caches right away, not only after the next poll.
+    await revision_watcher.check()
+    return result
+
+
+async def serialized_preset(preset_id: int, format: str) -> bytes | None:
+    # The compact content leaves out lines that do not change the result, so it loads faster.
+    if format == "compact":
+        db_preset = await async_crud.get_compact_preset(preset_id=preset_id)
+    else:
+        db_preset = await async_crud.get_preset(preset_id=preset_id)
+    return encode_item(db_preset) if db_preset is not None else None
 
 
 @app.get("/presets/{preset_id}", response_model=Preset, operation_id="get_preset")
-def read_preset(preset_id: int):
-    db_preset = crud.get_preset(preset_id=preset_id)
-    if db_preset is None:
+async def read_preset(preset_id: int, format: Literal["full", "compact"] = "full"):
+    # A shared preset link makes many clients ask at once; they share one read and its bytes.
+    body = await preset_flight.do((preset_id, format), lambda: serialized_preset(preset_id, format))
+    if body is None:
+        raise HTTPException(status_code=404, detail="Preset not found")
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/presets/{preset_id}/commands", response_model=List[CliCommand], operation_id="get_preset_commands")
+async def read_preset_commands(preset_id: int):
+    commands = await async_crud.get_commands(preset_id=preset_id)
+    if commands is None:
         raise HTTPException(status_code=404, detail="Preset not found")
-    return db_preset
+    return commands
+
+
+@app.get("/facets", response_model=Facets, operation_id="get_facets")
+async def read_facets(tags: List[str] = TagsQuery, tag_mode: Literal["and", "or"] = "and", author: Optional[str] = None):
+    filters = crud.preset_filters(tags=tags, match_all_tags=tag_mode == "and", author=author)
+    return await async_crud.get_facets(filters=filters)
 
 
 @app.get("/search_filters", response_model=List[SearchFilter], operation_id="get_all_search_filters")
-def read_search_filters():
-    return crud.get_all_search_filters()
+async def read_search_filters(request: Request, response: Response, after: Optional[int] = AfterQuery, limit: int = LimitQuery, stream: bool = False):
+    if stream:
+        search_filters = async_crud.iter_all_search_filters(after=after, batch_size=STREAM_BATCH_SIZE)
+        return StreamingResponse(stream_json_array(search_filters), media_type="application/json")
+
+    search_filters = await async_crud.get_search_filters_page(after=after, limit=limit)
+    set_next_page_link(request, response, search_filters[-1].id if search_filters else None, len(search_filters), limit)
+    return search_filters
+
+
+@app.get("/search_filters/{filter_id}/results", response_model=SearchFilterResults, operation_id="get_search_filter_results")
+async def read_search_filter_results(filter_id: int):
+    search_filter = await async_crud.get_search_filter(filter_id=filter_id)
+    if search_filter is None:
+        raise HTTPException(status_code=404, detail="Search filter not found")
+    revision, ids = await search_filter_results_cache.get(search_filter)
+    return json_response({"filter_id": filter_id, "revision": revision, "ids": ids})
 
 
 @app.get("search_filter/{filter_id}", response_model=SearchFilter, operation_id="get_search_filter")
-def read_search_filter(filter_id: int):
-    db_preset = crud.get_search_filter(filter_id=filter_id)
+async def read_search_filter(filter_id: int):
+    db_preset = await async_crud.get_search_filter(filter_id=filter_id)
@@ -0,0 +1,173 @@
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Metrics are kept per process; with several workers, scrape each of them.
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per label combination.
+
+    Only the event loop observes values, so no locking is needed.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Per series: a count per bucket, then one for values above the last bucket, the sum and the count.
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in self._series.items():
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            separator = "," if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text}{separator}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text}{separator}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_LABELS = ("method", "route", "status")
+
+request_seconds = Histogram(
+    "bfquickload_request_duration_seconds", "Time from receiving a request to sending the last byte of its response.",
+    REQUEST_LABELS, LATENCY_BUCKETS
+)
+response_bytes = Histogram(
+    "bfquickload_response_size_bytes", "Size of response bodies.", REQUEST_LABELS, SIZE_BUCKETS
+)
+request_db_seconds = Histogram(
+    "bfquickload_request_db_duration_seconds", "Time spent executing SQL statements per request.",
+    REQUEST_LABELS, LATENCY_BUCKETS
+)
+request_db_queries = Histogram(
+    "bfquickload_request_db_queries", "Number of SQL statements executed per request.",
+    REQUEST_LABELS, QUERY_COUNT_BUCKETS
+)
+HISTOGRAMS = [request_seconds, response_bytes, request_db_seconds, request_db_queries]
+
+requests_in_flight = 0
+
+# Functions of other modules returning exposition lines, called when /metrics is scraped.
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register_collector(collect: Callable[[], List[str]]):
+    _collectors.append(collect)
+
+
+def register_gauge(name: str, documentation: str, value: Callable[[], float]):
+    register_collector(lambda: [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {value()}"])
+
+
+class RequestDatabaseStats:
+    __slots__ = ("seconds", "queries")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+
+# The stats of the request being handled. Threadpool workers and the async engine's greenlets
+# run in a copy of the request's context, so their statements land on the same object.
+_request_db_stats: ContextVar[RequestDatabaseStats | None] = ContextVar("request_db_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(connection, cursor, statement, parameters, context, executemany):
+    connection.info["metrics_query_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(connection, cursor, statement, parameters, context, executemany):
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats.seconds += time.perf_counter() - connection.info.pop("metrics_query_start")
+        stats.queries += 1
+
+
+class MetricsMiddleware:
+    """
+    Records latency, response size and database usage of every HTTP request.
+
+    A plain ASGI middleware rather than an HTTP one, so streamed responses are measured until
+    their last chunk and nothing is buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        global requests_in_flight
+        requests_in_flight += 1
+        stats = RequestDatabaseStats()
+        token = _request_db_stats.set(stats)
+        status = 500
+        size = 0
+
+        async def send_and_measure(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            seconds = time.perf_counter() - start
+            _request_db_stats.reset(token)
+            requests_in_flight -= 1
+            # The route template, not the path, so /presets/{preset_id} is a single series.
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched", str(status))
+            request_seconds.observe(labels, seconds)
+            response_bytes.observe(labels, size)
+            request_db_seconds.observe(labels, stats.seconds)
+            request_db_queries.observe(labels, stats.queries)
+
+
+def render() -> str:
+    lines = [
+        "# HELP bfquickload_requests_in_flight Number of HTTP requests being handled.",
+        "# TYPE bfquickload_requests_in_flight gauge",
+        f"bfquickload_requests_in_flight {requests_in_flight}",
+    ]
+    for collect in _collectors:
+        lines.extend(collect())
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
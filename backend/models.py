@@ -1,19 +1,73 @@
-from typing import Optional, List
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional, List, Sequence
 
 from pydantic import BaseModel
-from sqlalchemy import Column
+from sqlalchemy import Column, Connection, Index, delete, event, func, inspect, text
+from sqlalchemy.dialects.sqlite import insert
 from sqlmodel import Field, SQLModel, JSON
 
 
-class Preset(SQLModel, table=True):
+class PresetBase(SQLModel):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(default="")
     description: str = Field(default="")
     tags: List[str] = Field(default_factory=list, sa_column=Column(JSON))
-    author: str = Field(default="unknown")
+    author: str = Field(default="unknown", index=True)
+
+
+class Preset(PresetBase):
     content: str = Field(default="")
 
 
+class ContentDictionary(SQLModel, table=True):
+    __tablename__ = "content_dictionary"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    codec: str
+    data: bytes
+
+
+class ContentBlob(SQLModel, table=True):
+    __tablename__ = "content_blob"
+
+    hash: str = Field(primary_key=True)
+    codec: str
+    dictionary_id: Optional[int] = Field(default=None, foreign_key="content_dictionary.id")
+    size: int
+    data: bytes
+
+
+class PresetRecord(PresetBase, table=True):
+    """
+    The stored form of a Preset. Its content lives in content_blob, addressed by content_hash.
+    """
+    __tablename__ = "preset"
+
+    content_hash: str = Field(foreign_key="content_blob.hash", index=True)
+    # The data revision of the last write to this preset, for delta syncs.
+    revision: int = Field(default=0, index=True, sa_column_kwargs={"server_default": "0"})
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+# Saved search filters match authors case-insensitively, as the extension does.
+Index("ix_preset_author_lower", func.lower(PresetRecord.author))
+
+
+class PresetTombstone(SQLModel, table=True):
+    __tablename__ = "preset_tombstone"
+
+    preset_id: int = Field(primary_key=True)
+    revision: int = Field(index=True)
+    deleted_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class PresetBatchItem(BaseModel):
+    id: int
+    found: bool
+    preset: Optional[Preset] = None
+
+
 class PresetMetadata(SQLModel):
     id: int
     name: str
@@ -21,10 +75,70 @@ class PresetMetadata(SQLModel):
     author: str
     tags: List[str]
 
+
+class PresetSearchHit(PresetMetadata):
+    rank: float
+    snippet: str
+
+
 class PresetsCatalog(BaseModel):
     presets_metadata: List[PresetMetadata]
     authors: List[str]
     tags: List[str]
+    # The data revision the catalog includes; pass it to /presets/changes as `since`.
+    revision: int = 0
+
+
+class PresetChanges(BaseModel):
+    revision: int
+    changed: List[PresetMetadata]
+    deleted: List[int]
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class Facets(BaseModel):
+    tags: List[FacetCount]
+    authors: List[FacetCount]
+
+
+class BulkImportRow(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkImportResult(BaseModel):
+    created: int
+    failed: int
+    rows: List[BulkImportRow]
+
+
+class QueryStats(BaseModel):
+    statement: str
+    count: int
+    total_ms: float
+    max_ms: float
+    # EXPLAIN QUERY PLAN of the first execution slower than profiler.slow_query_ms.
+    plan: Optional[List[str]] = None
+    full_scan: bool = False
+    # The full scan feeds a LIMIT without sorting, so it can stop early if enough rows match.
+    bounded_scan: bool = False
+
+
+class RepeatedQuery(BaseModel):
+    method: str
+    path: str
+    statement: str
+    count: int
+
+
+class QueryProfile(BaseModel):
+    statements: List[QueryStats]
+    repeated: List[RepeatedQuery]
 
 
 class SearchFilter(SQLModel, table=True):
@@ -33,3 +147,156 @@ class SearchFilter(SQLModel, table=True):
     search_query: str
     author: str
     tags: List[str] = Field(sa_column=Column(JSON))
+
+
+class PresetFilterResult(BaseModel):
+    # The data revision the result is current for.
+    revision: int
+    # The number of matching presets; ids holds one page of them.
+    count: int
+    ids: List[int]
+
+
+class SearchFilterResults(BaseModel):
+    filter_id: int
+    # The data revision the ids are current for.
+    revision: int
+    ids: List[int]
+
+
+class DataRevision(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    revision: int = Field(default=0)
+
+
+class PresetTag(SQLModel, table=True):
+    __tablename__ = "preset_tag"
+    __table_args__ = (Index("ix_preset_tag_tag_preset_id", "tag", "preset_id"),)
+
+    preset_id: int = Field(foreign_key="preset.id", primary_key=True)
+    tag: str = Field(primary_key=True)
+
+
+class Author(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    preset_count: int = Field(default=0)
+
+
+class CliCommand(SQLModel):
+    """
+    One command of a preset's Betaflight CLI content, as parsed by betaflight_cli.py.
+
+    `name` is what the command sets: the setting of a `set` command, `<command> <slot>` for
+    slot commands like `aux 2` and `adjrange 2`, and the command itself otherwise.
+    """
+    line: int
+    command: str
+    name: str
+    value: str = ""
+    profile: Optional[int] = None
+    rateprofile: Optional[int] = None
+
+
+class SettingValue(BaseModel):
+    preset_id: int
+    value: str
+
+
+class SettingConflict(BaseModel):
+    name: str
+    profile: Optional[int] = None
+    rateprofile: Optional[int] = None
+    # In load order; the last value is the one that takes effect.
+    values: List[SettingValue]
+
+
+class PresetMerge(BaseModel):
+    ids: List[int]
+    # The commands of `content` in load order; `line` is their line in it.
+    commands: List[CliCommand]
+    conflicts: List[SettingConflict]
+    content: str
+
+
+class PresetDiff(BaseModel):
+    a: int
+    b: int
+    only_in_a: List[CliCommand]
+    only_in_b: List[CliCommand]
+    changed: List[SettingConflict]
+
+
+class PresetCommand(CliCommand, table=True):
+    __tablename__ = "preset_command"
+    # Maps setting names to the presets setting them.
+    __table_args__ = (Index("ix_preset_command_name_preset_id", "name", "preset_id"),)
+
+    preset_id: int = Field(foreign_key="preset.id", primary_key=True)
+    line: int = Field(primary_key=True)
+
+
+# preset_tag and author mirror PresetRecord.tags and PresetRecord.author. They are kept in sync by the
+# mapper events below, in the same transaction as the preset row itself.
+
+def add_to_tag_index(connection: Connection, presets: Sequence[Preset | PresetRecord]):
+    preset_tags = [{"preset_id": p.id, "tag": tag} for p in presets for tag in set(p.tags or [])]
+    if preset_tags:
+        connection.execute(insert(PresetTag).on_conflict_do_nothing(), preset_tags)
+
+    author_counts = Counter(p.author for p in presets)
+    if author_counts:
+        statement = insert(Author)
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=["name"],
+                set_={"preset_count": Author.preset_count + statement.excluded.preset_count}
+            ),
+            [{"name": author, "preset_count": count} for author, count in author_counts.items()]
+        )
+
+
+def add_revision_to_tag_index(connection: Connection, revision: int):
+    # add_to_tag_index for every preset written at a revision, in two statements.
+    connection.execute(text(
+        "INSERT INTO preset_tag(preset_id, tag) "
+        "SELECT DISTINCT preset.id, json_each.value FROM preset, json_each(preset.tags) "
+        "WHERE preset.revision = :revision "
+        "ON CONFLICT DO NOTHING"
+    ), {"revision": revision})
+    connection.execute(text(
+        "INSERT INTO author(name, preset_count) "
+        "SELECT author, count(*) FROM preset WHERE revision = :revision GROUP BY author "
+        "ON CONFLICT(name) DO UPDATE SET preset_count = preset_count + excluded.preset_count"
+    ), {"revision": revision})
+
+
+def remove_from_tag_index(connection: Connection, preset_id: int, author: str):
+    connection.execute(delete(PresetTag).where(PresetTag.preset_id == preset_id))
+    connection.execute(
+        Author.__table__.update().where(Author.name == author).values(preset_count=Author.preset_count - 1)
+    )
+    connection.execute(delete(Author).where(Author.name == author, Author.preset_count <= 0))
+
+
+def _committed_value(preset: PresetRecord, attribute: str):
+    history = inspect(preset).attrs[attribute].history
+    return history.deleted[0] if history.deleted else getattr(preset, attribute)
+
+
+@event.listens_for(PresetRecord, "after_insert")
+def _index_inserted_preset(mapper, connection: Connection, preset: PresetRecord):
+    add_to_tag_index(connection, [preset])
+
+
+@event.listens_for(PresetRecord, "after_update")
+def _index_updated_preset(mapper, connection: Connection, preset: PresetRecord):
+    state = inspect(preset)
+    if not (state.attrs.tags.history.has_changes() or state.attrs.author.history.has_changes()):
+        return
+    remove_from_tag_index(connection, preset.id, _committed_value(preset, "author"))
+    add_to_tag_index(connection, [preset])
+
+
+@event.listens_for(PresetRecord, "after_delete")
+def _index_deleted_preset(mapper, connection: Connection, preset: PresetRecord):
+    remove_from_tag_index(connection, preset.id, _committed_value(preset, "author"))
@@ -0,0 +1,209 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, List, Sequence, Tuple, TypeVar
+
+from betaflight_cli import ACTION_COMMANDS, BARRIER_COMMANDS, is_slot_default, render_command
+from config import config
+from models import CliCommand, PresetDiff, PresetMerge, SettingConflict, SettingValue
+
+V = TypeVar("V")
+
+SettingKey = Tuple
+
+
+class LRUCache(Generic[V]):
+    """
+    Keeps the most recently used values up to a maximum number of entries.
+
+    Lookups come from threadpool workers as well as the event loop, so access is locked.
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._entries: OrderedDict[Hashable, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], V]) -> V:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Merges, diffs and compacted contents are keyed on the content hashes of their presets, never
+# their ids: the same contents always give the same result, so entries never go stale and
+# renamed or re-uploaded copies of a preset share them.
+merge_cache: LRUCache[PresetMerge | PresetDiff | str] = LRUCache(config["merge"]["cache_size"])
+
+
+def setting_key(command: CliCommand) -> SettingKey:
+    # set and slot commands overwrite earlier values of the same name. Other commands, such as
+    # feature, add up, so every distinct one is a setting of its own.
+    if command.command == "set" or command.name != command.command:
+        return command.profile, command.rateprofile, command.name
+    return command.profile, command.rateprofile, command.name, command.value
+
+
+def _in_load_order(command_lists: Sequence[Sequence[CliCommand]]) -> List[List[CliCommand]]:
+    # Each preset is parsed on its own, so its commands before any section of its own have none.
+    # Loaded after others, they run in the profile and rateprofile those left active.
+    resolved: List[List[CliCommand]] = []
+    profile = rateprofile = None
+    for commands in command_lists:
+        resolved.append([])
+        for command in commands:
+            if (command.profile is None and profile is not None) or (command.rateprofile is None and rateprofile is not None):
+                command = command.model_copy(update={
+                    "profile": profile if command.profile is None else command.profile,
+                    "rateprofile": rateprofile if command.rateprofile is None else command.rateprofile,
+                })
+            profile, rateprofile = command.profile, command.rateprofile
+            resolved[-1].append(command)
+    return resolved
+
+
+def _effective_commands(command_lists: Sequence[Sequence[CliCommand]]) -> Tuple[Dict[SettingKey, CliCommand], Dict[SettingKey, Dict[int, str]]]:
+    # Replays the presets in load order. Returns the command that takes effect per setting and
+    # the value every preset left for it, keyed on the preset's position.
+    effective: Dict[SettingKey, CliCommand] = {}
+    values: Dict[SettingKey, Dict[int, str]] = {}
+    for position, commands in enumerate(command_lists):
+        for command in commands:
+            if command.command in ACTION_COMMANDS:
+                continue
+            key = setting_key(command)
+            effective[key] = command
+            values.setdefault(key, {})[position] = command.value
+    return effective, values
+
+
+def _conflict(key: SettingKey, values: Dict[int, str]) -> SettingConflict:
+    return SettingConflict(
+        name=key[2],
+        profile=key[0],
+        rateprofile=key[1],
+        values=[SettingValue(preset_id=position, value=value) for position, value in values.items()]
+    )
+
+
+def _without_overwritten(commands: Sequence[CliCommand]) -> List[CliCommand]:
+    # Keeps the commands in their order, dropping those a later one in the same section
+    # overwrites before the next save or defaults.
+    kept: List[CliCommand] = []
+    overwritten = set()
+    for command in reversed(commands):
+        if command.command in ACTION_COMMANDS:
+            if command.command in BARRIER_COMMANDS:
+                overwritten = set()
+            kept.append(command)
+            continue
+        key = setting_key(command)
+        if key not in overwritten:
+            overwritten.add(key)
+            kept.append(command)
+    kept.reverse()
+    return kept
+
+
+def _render(commands: Sequence[CliCommand]) -> Tuple[List[CliCommand], str]:
+    # Presets may mark sections with comments alone, so a section a command did not switch to
+    # gets its comment back wherever it changes.
+    rendered: List[CliCommand] = []
+    lines: List[str] = []
+    section = (None, None)
+    for command in commands:
+        if command.command not in ("profile", "rateprofile") and (command.profile, command.rateprofile) != section:
+            if command.profile is not None and command.profile != section[0]:
+                lines.append(f"# profile {command.profile}")
+            if command.rateprofile is not None and command.rateprofile != section[1]:
+                lines.append(f"# rateprofile {command.rateprofile}")
+        section = (command.profile, command.rateprofile)
+        rendered.append(command.model_copy(update={"line": len(lines)}))
+        lines.append(render_command(command))
+    return rendered, "\n".join(lines)
+
+
+def merge_commands(command_lists: Sequence[Sequence[CliCommand]]) -> PresetMerge:
+    """
+    Combines the commands of presets loaded one after another into one minimal command stream.
+
+    The stream keeps the load order and drops only lines a later one overwrites. Commands outside
+    any section of their preset apply to the profile and rateprofile the presets before left
+    active. Presets are referenced by their position in `command_lists`; see with_ids().
+
+    Args:
+        command_lists (Sequence[Sequence[CliCommand]]): The commands of every preset, in load order.
+    """
+    command_lists = _in_load_order(command_lists)
+    effective, values = _effective_commands(command_lists)
+    commands, content = _render(_without_overwritten([command for commands in command_lists for command in commands]))
+    conflicts = [
+        _conflict(key, preset_values) for key, preset_values in values.items()
+        if len(set(preset_values.values())) > 1
+    ]
+    return PresetMerge(ids=list(range(len(command_lists))), commands=commands, conflicts=conflicts, content=content)
+
+
+def compact_commands(commands: Sequence[CliCommand]) -> str:
+    """
+    Renders the commands of one preset without the lines that do not change its result.
+
+    Lines overwritten later in the same section are dropped, and so are slots that only restate
+    their defaults, on the assumption that the board has no other use for them. The rest keep
+    their order.
+    """
+    return _render([command for command in _without_overwritten(commands) if not is_slot_default(command)])[1]
+
+
+def diff_commands(a: Sequence[CliCommand], b: Sequence[CliCommand]) -> PresetDiff:
+    """
+    Compares the settings two presets leave behind, each loaded on its own.
+
+    Presets are referenced by their position, 0 for `a` and 1 for `b`; see with_ids().
+    """
+    effective_a, _ = _effective_commands([a])
+    effective_b, _ = _effective_commands([b])
+    return PresetDiff(
+        a=0,
+        b=1,
+        only_in_a=[command for key, command in effective_a.items() if key not in effective_b],
+        only_in_b=[command for key, command in effective_b.items() if key not in effective_a],
+        changed=[
+            _conflict(key, {0: command.value, 1: effective_b[key].value})
+            for key, command in effective_a.items()
+            if key in effective_b and effective_b[key].value != command.value
+        ]
+    )
+
+
+def _conflicts_with_ids(conflicts: List[SettingConflict], ids: Sequence[int]) -> List[SettingConflict]:
+    return [conflict.model_copy(update={"values": [
+        value.model_copy(update={"preset_id": ids[value.preset_id]}) for value in conflict.values
+    ]}) for conflict in conflicts]
+
+
+def with_ids(result: PresetMerge | PresetDiff, ids: Sequence[int]) -> PresetMerge | PresetDiff:
+    """
+    Replaces the preset positions in a cached merge or diff with the ids they were requested for.
+    """
+    if isinstance(result, PresetDiff):
+        return result.model_copy(update={
+            "a": ids[0],
+            "b": ids[1],
+            "changed": _conflicts_with_ids(result.changed, ids)
+        })
+    return result.model_copy(update={
+        "ids": list(ids),
+        "conflicts": _conflicts_with_ids(result.conflicts, ids)
+    })
@@ -0,0 +1,144 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Deque, Dict, Tuple
+
+from sqlalchemy import Engine, event
+
+from config import config
+from models import QueryProfile, QueryStats, RepeatedQuery
+
+ENABLED = config["profiler"]["enabled"]
+SLOW_QUERY_SECONDS = config["profiler"]["slow_query_ms"] / 1000
+REPEATED_QUERY_THRESHOLD = config["profiler"]["repeated_query_threshold"]
+DUMP_FILE = config["profiler"]["dump_file"]
+
+MAX_REPEATED_QUERIES = 100
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+KEYSET_PAGE = re.compile(r"\bORDER BY (?:\w+\.)?(?:id|rowid)(?: ASC)? LIMIT\b", re.IGNORECASE)
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+def normalize(statement: str) -> str:
+    # Literals and expanded IN lists vary between executions of the same query; fold them away.
+    statement = STRING_LITERAL.sub("?", statement)
+    statement = NUMBER_LITERAL.sub("?", statement)
+    statement = PARAMETER_LIST.sub("(?...)", statement)
+    return WHITESPACE.sub(" ", statement).strip()
+
+
+_lock = threading.Lock()
+_statements: Dict[str, QueryStats] = {}
+_repeated: Deque[RepeatedQuery] = deque(maxlen=MAX_REPEATED_QUERIES)
+
+# Statements run for the current request, by normalized statement; it reaches threadpool
+# workers and greenlets as metrics._request_db_stats does.
+_request_statements: ContextVar[Counter | None] = ContextVar("request_statements", default=None)
+
+
+def _explain(connection, statement: str, parameters) -> list:
+    # Straight on the DBAPI connection, so the EXPLAIN itself is not profiled.
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def _is_keyset_page(statement: str, plan: list) -> bool:
+    # An unfiltered page in rowid order reads the table in that order and stops at the LIMIT.
+    return len(plan) == 1 and " WHERE " not in statement.upper() and KEYSET_PAGE.search(statement) is not None
+
+
+def _scan_flags(statement: str, plan: list) -> Tuple[bool, bool]:
+    # Returns (full_scan, bounded_scan). FTS lookups show as a SCAN of their virtual table.
+    scans = [step for step in plan if step.startswith("SCAN ") and " USING " not in step and " VIRTUAL TABLE " not in step]
+    if not scans or _is_keyset_page(statement, plan):
+        return False, False
+    # A scan feeding a LIMIT in its own order may stop early, but reads the whole table when few rows match.
+    bounded = " LIMIT " in statement.upper() and not any("TEMP B-TREE" in step for step in plan)
+    return True, bounded
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    connection.info["profiler_query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - connection.info.pop("profiler_query_start")
+    normalized = normalize(statement)
+
+    request_statements = _request_statements.get()
+    if request_statements is not None:
+        request_statements[normalized] += 1
+
+    with _lock:
+        stats = _statements.get(normalized)
+        if stats is None:
+            stats = _statements[normalized] = QueryStats(statement=normalized, count=0, total_ms=0, max_ms=0)
+        stats.count += 1
+        stats.total_ms += seconds * 1000
+        stats.max_ms = max(stats.max_ms, seconds * 1000)
+        needs_plan = stats.plan is None and seconds >= SLOW_QUERY_SECONDS
+
+    if needs_plan and not executemany and normalized.upper().startswith(EXPLAINABLE):
+        plan = _explain(connection, statement, parameters)
+        with _lock:
+            stats.plan = plan
+            stats.full_scan, stats.bounded_scan = _scan_flags(normalized, plan)
+
+
+def install(engine: Engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryProfilerMiddleware:
+    """
+    Flags requests that run the same statement at least profiler.repeated_query_threshold times.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        statements = Counter()
+        token = _request_statements.set(statements)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_statements.reset(token)
+            for statement, count in statements.items():
+                if count >= REPEATED_QUERY_THRESHOLD:
+                    _repeated.append(RepeatedQuery(method=scope["method"], path=scope["path"], statement=statement, count=count))
+
+
+def get_profile() -> QueryProfile:
+    with _lock:
+        statements = [stats.model_copy() for stats in _statements.values()]
+        repeated = list(_repeated)
+    return QueryProfile(
+        statements=sorted(statements, key=lambda stats: stats.total_ms, reverse=True),
+        repeated=repeated
+    )
+
+
+def reset():
+    with _lock:
+        _statements.clear()
+        _repeated.clear()
+
+
+def dump(path: str):
+    with open(path, "w") as f:
+        f.write(get_profile().model_dump_json(indent=2))
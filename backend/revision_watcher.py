@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import sqlite3
+from typing import Awaitable, Callable, List
+
+from fastapi.concurrency import run_in_threadpool
+
+import async_crud
+from config import config
+
+POLL_INTERVAL_SECONDS = config["invalidation"]["poll_interval_ms"] / 1000
+
+logger = logging.getLogger(__name__)
+
+
+class RevisionWatcher:
+    """
+    Notices writes from any process sharing the database and refreshes derived state in the background.
+
+    Every poll reads PRAGMA data_version on a connection of the watcher's own. SQLite changes it
+    whenever another connection commits, whether in this process or another. Only then is the
+    data revision looked up, and every subscriber refreshes. A worker's caches thus catch up
+    with another worker's writes within invalidation.poll_interval_ms plus their rebuild time.
+
+    While the watcher runs, caches take the revision from it instead of looking it up on every
+    request. Without it, with a poll interval of 0, they look it up and are never stale.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.revision: int | None = None
+        self._subscribers: List[Callable[[], Awaitable]] = []
+        self._lock = asyncio.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._data_version: int | None = None
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, refresh: Callable[[], Awaitable]):
+        """
+        Registers a coroutine function to run whenever the data revision changes.
+        """
+        if refresh not in self._subscribers:
+            self._subscribers.append(refresh)
+
+    async def get_revision(self) -> int:
+        if self._task is None or self.revision is None:
+            return await async_crud.get_revision()
+        return self.revision
+
+    def _data_version_changed(self) -> bool:
+        [data_version] = self._connection.execute("PRAGMA data_version").fetchone()
+        changed = data_version != self._data_version
+        self._data_version = data_version
+        return changed
+
+    async def check(self):
+        """
+        Polls once, and refreshes the subscribers if the data changed since the last poll.
+
+        Routes that write call this afterwards, so this worker serves its own writes at once.
+        """
+        if self._task is None:
+            return
+        async with self._lock:
+            # data_version is read before the revision, so a commit in between is noticed next time.
+            if not await run_in_threadpool(self._data_version_changed):
+                return
+            revision = await async_crud.get_stored_revision()
+            if revision == self.revision:
+                return
+            self.revision = revision
+            for refresh in self._subscribers:
+                try:
+                    await refresh()
+                except Exception:
+                    logger.exception("Refreshing %r for revision %d failed", refresh, revision)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Polling the data revision failed")
+
+    async def start(self):
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._connection = sqlite3.connect(config["database"]["filename"], check_same_thread=False)
+        self._task = asyncio.create_task(self._run())
+        await self.check()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        self._connection.close()
+        self._connection = None
+        self._data_version = None
+        self.revision = None
+
+
+revision_watcher = RevisionWatcher(POLL_INTERVAL_SECONDS)
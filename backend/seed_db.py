@@ -1,10 +1,14 @@
+import argparse
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
 import crud
 from models import Preset
 from database import create_db_and_tables
 
-def seed_db():
-    create_db_and_tables()
-    presets = [
+def seed_presets() -> List[Preset]:
+    return [
         Preset(name="Get Version", description="Displays the Betaflight firmware version.", tags=["info", "diagnostics"], content="version", author="BFQuickLoad"),
         Preset(name="Dump All Settings", description="Dumps all current Betaflight settings to the CLI.", tags=["backup", "settings"], content="dump", author="BFQuickLoad"),
         Preset(name="Dump Diff", description="Dumps only settings that differ from the default values.", tags=["backup", "settings"], content="diff", author="BFQuickLoad"),
@@ -701,9 +705,65 @@ set thr_expo = 20
 set thr_mid = 41
 set thr_expo = 50""", author="Luki"),
     ]
-    for preset in presets:
-        crud.create_preset(preset)
-    print("Database seeded with dummy data.")
+
+def load_dumps(directory: str, author: str = "unknown") -> Iterator[Preset]:
+    """
+    Reads every .txt file below a directory as a preset containing a Betaflight CLI dump.
+
+    The file name becomes the preset name and the subdirectories it is in become its tags.
+
+    Args:
+        directory (str): The directory to search recursively.
+        author (str): Author of all loaded presets.
+    """
+    root = Path(directory)
+    for path in sorted(root.rglob("*.txt")):
+        yield Preset(
+            name=path.stem.replace("_", " "),
+            tags=[part.lower() for part in path.relative_to(root).parent.parts],
+            author=author,
+            content=path.read_text()
+        )
+
+
+def with_progress(presets: Iterable[Preset], every: int) -> Iterator[Preset]:
+    start = time.perf_counter()
+    for count, preset in enumerate(presets, 1):
+        yield preset
+        if count % every == 0:
+            print(f"Read {count} presets ({count / (time.perf_counter() - start):.0f}/s)", flush=True)
+
+
+def seed_db(presets: Iterable[Preset] | None = None, batch_size: int = 5000):
+    """
+    Fills the database with presets in one transaction, by default with the dummy presets above.
+
+    Presets whose content is already stored are skipped, so seeding again adds nothing.
+
+    Args:
+        presets (Iterable[Preset] | None): The presets to insert. May be a lazy iterator.
+        batch_size (int): Number of presets inserted per statement.
+    """
+    create_db_and_tables()
+    start = time.perf_counter()
+    ids = crud.create_presets(with_progress(seed_presets() if presets is None else presets, batch_size),
+                              batch_size=batch_size, skip_stored=True, defer_indexes=True)
+    print(f"Database seeded with {len(ids)} presets in {time.perf_counter() - start:.1f}s.")
 
 if __name__ == "__main__":
-    seed_db()
+    parser = argparse.ArgumentParser(description="Seed the database with presets.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--dumps", metavar="DIRECTORY", help="Load the .txt CLI dumps below this directory.")
+    source.add_argument("--synthetic", type=int, metavar="N", help="Generate N synthetic presets.")
+    parser.add_argument("--author", default="unknown", help="Author of presets loaded with --dumps.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic presets.")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.dumps:
+        seed_db(load_dumps(args.dumps, args.author), args.batch_size)
+    elif args.synthetic:
+        from synthetic_presets import generate_presets
+        seed_db(generate_presets(0, args.synthetic, args.seed), args.batch_size)
+    else:
+        seed_db(batch_size=args.batch_size)
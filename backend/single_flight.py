@@ -0,0 +1,76 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+import metrics
+from config import config
+
+T = TypeVar("T")
+
+ENABLED = config["single_flight"]["enabled"]
+
+
+class SingleFlight:
+    """
+    Lets concurrent identical reads share one in-flight computation and its result.
+
+    The first call for a key starts the computation; calls for the same key arriving before it
+    finishes wait for it instead of running their own. Nothing is kept once it finished, so a
+    result is never older than the oldest call waiting for it. It runs as a task of its own, so
+    a client disconnecting does not cancel it for the others.
+    """
+
+    def __init__(self, name: str, enabled: bool = ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        _flights.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns the result of fn(), shared with every concurrent call for the same key.
+
+        Args:
+            key (Hashable): Identifies identical reads, e.g. the route parameters.
+            fn (Callable[[], Awaitable[T]]): Computes the result.
+        """
+        self.calls += 1
+        if not self.enabled:
+            return await fn()
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Marks the exception as retrieved, in case every caller went away before it was raised.
+        if not task.cancelled():
+            task.exception()
+
+
+_flights: List[SingleFlight] = []
+
+
+def _render() -> List[str]:
+    lines = [
+        "# HELP bfquickload_single_flight_calls_total Reads handled by a single-flight group.",
+        "# TYPE bfquickload_single_flight_calls_total counter",
+    ]
+    lines.extend(f'bfquickload_single_flight_calls_total{{flight="{flight.name}"}} {flight.calls}' for flight in _flights)
+    lines.extend([
+        "# HELP bfquickload_single_flight_coalesced_total Reads that shared an identical in-flight read; "
+        "divide by the calls for the coalescing ratio.",
+        "# TYPE bfquickload_single_flight_coalesced_total counter",
+    ])
+    lines.extend(f'bfquickload_single_flight_coalesced_total{{flight="{flight.name}"}} {flight.coalesced}' for flight in _flights)
+    return lines
+
+
+metrics.register_collector(_render)
@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+import logging
+import os
+import sqlite3
+from typing import NamedTuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session
+
+import crud
+import metrics
+import query_profiler
+from config import config
+from database import pool_options
+
+ENABLED = config["database"]["snapshot"]["enabled"]
+MAX_BYTES = config["database"]["snapshot"]["max_mb"] * 2 ** 20
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    revision: int
+    engine: Engine
+    # Holds the in-memory database open; it is freed once this and every pooled connection closed.
+    keeper: sqlite3.Connection
+    size: int
+
+
+_names = itertools.count()
+_current: Snapshot | None = None
+_lock = asyncio.Lock()
+
+
+def _database_size(connection: sqlite3.Connection) -> int:
+    [page_count] = connection.execute("PRAGMA page_count").fetchone()
+    [page_size] = connection.execute("PRAGMA page_size").fetchone()
+    return page_count * page_size
+
+
+def _load() -> Snapshot | None:
+    source = sqlite3.connect(config["database"]["filename"])
+    try:
+        size = _database_size(source)
+        if size > MAX_BYTES:
+            logger.warning("The database takes %.0f MB, more than database.snapshot.max_mb; reads use the file",
+                           size / 2 ** 20)
+            return None
+        # A named shared-cache database, so every pooled connection of this process sees the same copy.
+        uri = f"file:bfquickload_snapshot_{os.getpid()}_{next(_names)}?mode=memory&cache=shared"
+        keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        source.backup(keeper)
+    finally:
+        source.close()
+
+    def connect() -> sqlite3.Connection:
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+
+    engine = create_engine("sqlite://", creator=connect, poolclass=QueuePool, **pool_options())
+    if query_profiler.ENABLED:
+        query_profiler.install(engine)
+    with Session(engine) as session:
+        revision = crud._get_revision(session)
+    logger.info("Loaded a snapshot of revision %d taking %.1f MB", revision, size / 2 ** 20)
+    return Snapshot(revision=revision, engine=engine, keeper=keeper, size=size)
+
+
+def _swap(snapshot: Snapshot | None):
+    global _current
+    previous, _current = _current, snapshot
+    if previous is not None:
+        # Reads still running on the previous snapshot keep their connections until they finish.
+        previous.engine.dispose()
+        previous.keeper.close()
+
+
+def get_engine() -> Engine | None:
+    """
+    Returns the engine of the current snapshot, or None if reads have to use the database file.
+    """
+    snapshot = _current
+    return snapshot.engine if snapshot is not None else None
+
+
+def load():
+    _swap(_load())
+
+
+async def refresh():
+    """
+    Loads a new snapshot if the database file holds a newer revision than the current one.
+
+    Subscribed to the revision watcher, so snapshots follow writes from every process. The new
+    snapshot is loaded while reads go on against the current one, and then swapped in, so memory
+    peaks at two snapshots during a reload.
+    """
+    revision = await run_in_threadpool(crud.get_revision)
+    if _current is not None and revision <= _current.revision:
+        return
+    async with _lock:
+        if _current is None or revision > _current.revision:
+            _swap(await run_in_threadpool(_load))
+
+
+metrics.register_gauge("bfquickload_snapshot_bytes", "Size of the in-memory database snapshot, 0 without one.",
+                       lambda: _current.size if _current is not None else 0)
+metrics.register_gauge("bfquickload_snapshot_revision", "Data revision of the in-memory database snapshot.",
+                       lambda: _current.revision if _current is not None else 0)
@@ -0,0 +1,75 @@
+import random
+import re
+from typing import Iterator, List, Tuple
+
+from models import Preset, SearchFilter
+from seed_db import seed_presets
+
+AUTHORS = 1000
+STYLE_TAGS = ["freestyle", "racing", "cinematic", "longrange", "whoop", "micro", "2inch", "3inch", "5inch", "7inch",
+              "bf4.3", "bf4.4", "bf4.5", "analog", "digital", "elrs", "crsf", "gps", "led", "beginner"]
+
+NUMERIC_SETTING = re.compile(r"^(set \S+ = )(\d+)$", re.MULTILINE)
+
+
+def _vary_content(content: str, rng: random.Random) -> str:
+    # Nudge about half of the numeric settings, so contents differ like real tunes of one frame do.
+    def vary(match: re.Match) -> str:
+        value = int(match.group(2))
+        if rng.random() < 0.5:
+            value = max(0, value + rng.randint(-value // 10 - 1, value // 10 + 1))
+        return f"{match.group(1)}{value}"
+    return NUMERIC_SETTING.sub(vary, content)
+
+
+def generate_presets(start: int, stop: int, seed: int = 0) -> Iterator[Preset]:
+    """
+    Generates synthetic presets modelled on the presets of seed_db.py.
+
+    Every preset depends only on its index and the seed, so any range of a corpus can be
+    generated on its own and a corpus can be grown without regenerating its start.
+
+    Args:
+        start (int): Index of the first preset.
+        stop (int): Index after the last preset.
+        seed (int): Seed of the corpus.
+    """
+    templates = seed_presets()
+    for index in range(start, stop):
+        rng = random.Random(f"{seed}:{index}")
+        template = templates[index % len(templates)]
+        tags, author = _tags_and_author(template, rng)
+        name = f"{template.name} #{index}"
+        yield Preset(
+            name=name,
+            description=template.description,
+            tags=tags,
+            author=author,
+            # The header comment keeps every content distinct, as it is in real uploads.
+            content=f"# {name}\n{_vary_content(template.content, rng)}"
+        )
+
+
+def _tags_and_author(template: Preset, rng: random.Random) -> Tuple[List[str], str]:
+    extra_tags = rng.sample(STYLE_TAGS, rng.randint(0, 3))
+    tags = list(dict.fromkeys(template.tags + extra_tags))
+    return tags, template.author if rng.random() < 0.2 else f"pilot{rng.randrange(AUTHORS)}"
+
+
+def generate_tags_and_authors(start: int, stop: int, seed: int = 0) -> Iterator[Tuple[List[str], str]]:
+    """
+    Generates the tags and author of the presets generate_presets() gives, without their content.
+    """
+    templates = seed_presets()
+    for index in range(start, stop):
+        yield _tags_and_author(templates[index % len(templates)], random.Random(f"{seed}:{index}"))
+
+
+def generate_search_filters(count: int, seed: int = 0) -> List[SearchFilter]:
+    rng = random.Random(f"{seed}:search_filters")
+    return [SearchFilter(
+        name=f"Search Filter {index}",
+        search_query=rng.choice(["rates", "aux", "throttle", "osd", "pid", "whoop", "expo"]),
+        author=f"pilot{rng.randrange(AUTHORS)}",
+        tags=rng.sample(STYLE_TAGS, rng.randint(1, 2))
+    ) for index in range(count)]
@@ -0,0 +1,8 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The backend modules import each other by their plain names and read config.yaml when imported.
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("BFQUICKLOAD_CONFIG", os.path.join(BACKEND_DIR, "config.yaml"))
@@ -0,0 +1,64 @@
+import pytest
+
+from bitmap_index import BitmapIndex, iter_ids
+
+
+@pytest.fixture
+def index() -> BitmapIndex:
+    index = BitmapIndex()
+    index.build([
+        (1, "Luki", ["a"]),
+        (2, "Luki", ["b"]),
+        (3, "Luki", ["a", "b"]),
+        (4, "other", ["c"]),
+        (5, "other", ["a", "c"]),
+        (6, "two words", ["b", "c"]),
+    ], revision=1)
+    return index
+
+
+def ids(index: BitmapIndex, expression: str):
+    return list(iter_ids(index.query(expression)))
+
+
+def test_single_terms(index):
+    assert ids(index, "tag:a") == [1, 3, 5]
+    assert ids(index, "author:Luki") == [1, 2, 3]
+    assert ids(index, "tag:missing") == []
+
+
+def test_and_binds_tighter_than_or(index):
+    assert ids(index, "tag:a OR tag:b AND tag:c") == [1, 3, 5, 6]
+    assert ids(index, "tag:b AND tag:c OR tag:a") == [1, 3, 5, 6]
+
+
+def test_not_binds_tighter_than_and(index):
+    assert ids(index, "NOT tag:a AND tag:b") == [2, 6]
+    assert ids(index, "NOT NOT tag:a") == [1, 3, 5]
+
+
+def test_parentheses_override_precedence(index):
+    assert ids(index, "(tag:a OR tag:b) AND tag:c") == [5, 6]
+    assert ids(index, "NOT (tag:a OR tag:b)") == [4]
+    assert ids(index, "tag:c AND (author:other OR (tag:b AND NOT author:other))") == [4, 5, 6]
+
+
+def test_adjacent_terms_are_anded(index):
+    assert ids(index, "tag:a tag:c") == ids(index, "tag:a AND tag:c") == [5]
+    assert ids(index, "tag:c (author:Luki OR NOT tag:a)") == [4, 6]
+
+
+def test_quoted_terms(index):
+    assert ids(index, 'author:"two words"') == [6]
+    assert ids(index, '(author:"two words")') == [6]
+
+
+@pytest.mark.parametrize("expression", ["", "(tag:a", "tag:a)", "tag:a OR", "AND tag:a", "tag:a ?"])
+def test_invalid_expressions(index, expression):
+    with pytest.raises(ValueError):
+        index.query(expression)
+
+
+def test_iter_ids_starts_after(index):
+    assert list(iter_ids(index.query("tag:a"), after=1)) == [3, 5]
+    assert list(iter_ids(index.query("tag:a"), after=-5)) == [1, 3, 5]
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from bulk_import import _iter_array
+
+DOCUMENT = ' [ {"name": "é€😀 ]},[", "tags": ["a", "b"]} ,\n12345, -1.5e3, "x", [[]], {}, true, null ]\n'
+ITEMS = [{"name": "é€😀 ]},[", "tags": ["a", "b"]}, 12345, -1.5e3, "x", [[]], {}, True, None]
+
+
+def chunked(data: bytes, size: int):
+    return iter([data[start:start + size] for start in range(0, len(data), size)])
+
+
+@pytest.mark.parametrize("size", range(1, len(DOCUMENT.encode()) + 1))
+def test_items_are_decoded_across_any_chunk_boundary(size):
+    assert list(_iter_array(chunked(DOCUMENT.encode(), size))) == ITEMS
+
+
+def test_items_are_yielded_before_the_rest_is_read():
+    chunks = chunked(json.dumps([{"name": str(i)} for i in range(100)]).encode(), 7)
+    items = _iter_array(chunks)
+
+    assert next(items) == {"name": "0"}
+    assert next(chunks, None) is not None
+
+
+@pytest.mark.parametrize("size", [1, 2, 5])
+def test_empty_array(size):
+    assert list(_iter_array(chunked(b" [ ] ", size))) == []
+
+
+@pytest.mark.parametrize("document", [b"", b'{"name": "a"}', b"[1 2]", b"[1,", b"[1] x", b'[{"name": ]'])
+@pytest.mark.parametrize("size", [1, 3, 64])
+def test_invalid_documents(document, size):
+    with pytest.raises(ValueError):
+        list(_iter_array(chunked(document, size)))
@@ -0,0 +1,94 @@
+from betaflight_cli import parse_commands
+from preset_merge import compact_commands, merge_commands, with_ids
+
+
+def merge(*contents: str):
+    return merge_commands([parse_commands(content) for content in contents])
+
+
+def test_merge_drops_overwritten_lines_and_keeps_load_order():
+    result = merge("set p_pitch = 40\nset p_roll = 40", "set p_pitch = 50\nfeature -AIRMODE")
+
+    assert result.content == "set p_roll = 40\nset p_pitch = 50\nfeature -AIRMODE"
+    assert [command.line for command in result.commands] == [0, 1, 2]
+
+
+def test_merge_carries_sections_over_to_later_presets():
+    result = merge("# profile 1\nset p_pitch = 40\n# rateprofile 2\nset rc_rate = 100",
+                   "set p_pitch = 50\nset rc_rate = 120")
+
+    # The second preset has no sections of its own, so it runs in profile 1 and rateprofile 2.
+    assert [(command.name, command.profile, command.rateprofile) for command in result.commands] == [
+        ("p_pitch", 1, None), ("p_pitch", 1, 2), ("rc_rate", 1, 2)
+    ]
+    assert result.content == "# profile 1\nset p_pitch = 40\n# rateprofile 2\nset p_pitch = 50\nset rc_rate = 120"
+
+
+def test_merge_does_not_carry_sections_a_preset_sets_itself():
+    result = merge("# profile 1\nset p_pitch = 40", "# profile 0\nset p_pitch = 50")
+
+    assert [(command.profile, command.value) for command in result.commands] == [(1, "40"), (0, "50")]
+    assert result.conflicts == []
+
+
+def test_merge_keeps_lines_before_save_and_defaults():
+    assert merge("set p_pitch = 40", "save\nset p_pitch = 50").content == "set p_pitch = 40\nsave\nset p_pitch = 50"
+    assert merge("set p_pitch = 40\ndefaults", "set p_pitch = 50").content == "set p_pitch = 40\ndefaults\nset p_pitch = 50"
+
+
+def test_merge_reports_conflicts_with_the_last_value_of_every_preset():
+    result = merge("set p_pitch = 40\nset p_pitch = 45\nset p_roll = 40", "set p_pitch = 50\nset p_roll = 40")
+
+    [conflict] = result.conflicts
+    assert (conflict.name, conflict.profile, conflict.rateprofile) == ("p_pitch", None, None)
+    assert [(value.preset_id, value.value) for value in conflict.values] == [(0, "45"), (1, "50")]
+
+
+def test_merge_reports_conflicts_per_section():
+    result = merge("# profile 0\nset p_pitch = 40\n# profile 1\nset p_pitch = 40",
+                   "# profile 1\nset p_pitch = 50")
+
+    [conflict] = result.conflicts
+    assert (conflict.name, conflict.profile) == ("p_pitch", 1)
+
+
+def test_merge_treats_additive_commands_as_separate_settings():
+    result = merge("feature -AIRMODE", "feature GPS")
+
+    assert result.content == "feature -AIRMODE\nfeature GPS"
+    assert result.conflicts == []
+
+
+def test_with_ids_replaces_positions():
+    result = with_ids(merge("set p_pitch = 40", "set p_pitch = 50"), [7, 3])
+
+    assert result.ids == [7, 3]
+    assert [value.preset_id for value in result.conflicts[0].values] == [7, 3]
+
+
+def test_compact_drops_overwritten_lines_up_to_defaults():
+    content = "set a = 1\nset a = 2\ndefaults\nset a = 3\nset a = 4\nfeature X\nfeature X"
+
+    assert compact_commands(parse_commands(content)) == "set a = 2\ndefaults\nset a = 4\nfeature X"
+
+
+def test_compact_keeps_lines_before_save():
+    assert compact_commands(parse_commands("set a = 1\nsave\nset a = 1")) == "set a = 1\nsave\nset a = 1"
+
+
+def test_compact_drops_default_slots():
+    content = "aux 0 0 0 900 900 0 0\naux 1 0 1 1700 2100 0 0\nadjrange 0 0 0 900 900 0 0 0 0"
+
+    assert compact_commands(parse_commands(content)) == "aux 1 0 1 1700 2100 0 0"
+
+
+def test_compact_restores_section_comments():
+    content = "# profile 0\nset p = 1\n# profile 1\nset p = 2\n# profile 0\nset p = 3"
+
+    assert compact_commands(parse_commands(content)) == "# profile 1\nset p = 2\n# profile 0\nset p = 3"
+
+
+def test_compact_keeps_profile_commands():
+    content = "profile 1\nset p = 1\nprofile 2\nset p = 2"
+
+    assert compact_commands(parse_commands(content)) == content
@@ -7,11 +7,25 @@ export { CancelablePromise, CancelError } from './core/CancelablePromise';
 export { OpenAPI } from './core/OpenAPI';
 export type { OpenAPIConfig } from './core/OpenAPI';
 
+export type { BulkImportResult } from './models/BulkImportResult';
+export type { BulkImportRow } from './models/BulkImportRow';
+export type { CliCommand } from './models/CliCommand';
+export type { FacetCount } from './models/FacetCount';
+export type { Facets } from './models/Facets';
 export type { HTTPValidationError } from './models/HTTPValidationError';
 export type { Preset } from './models/Preset';
+export type { PresetBatchItem } from './models/PresetBatchItem';
+export type { PresetChanges } from './models/PresetChanges';
+export type { PresetDiff } from './models/PresetDiff';
+export type { PresetFilterResult } from './models/PresetFilterResult';
+export type { PresetMerge } from './models/PresetMerge';
 export type { PresetMetadata } from './models/PresetMetadata';
 export type { PresetsCatalog } from './models/PresetsCatalog';
+export type { PresetSearchHit } from './models/PresetSearchHit';
 export type { SearchFilter } from './models/SearchFilter';
+export type { SearchFilterResults } from './models/SearchFilterResults';
+export type { SettingConflict } from './models/SettingConflict';
+export type { SettingValue } from './models/SettingValue';
 export type { ValidationError } from './models/ValidationError';
 
 export { DefaultService } from './services/DefaultService';
@@ -0,0 +1,11 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+import type { BulkImportRow } from './BulkImportRow';
+export type BulkImportResult = {
+    created: number;
+    failed: number;
+    rows: Array<BulkImportRow>;
+};
+
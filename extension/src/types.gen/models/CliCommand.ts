@@ -0,0 +1,19 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+/**
+ * One command of a preset's Betaflight CLI content, as parsed by betaflight_cli.py.
+ *
+ * `name` is what the command sets: the setting of a `set` command, `<command> <slot>` for
+ * slot commands like `aux 2` and `adjrange 2`, and the command itself otherwise.
+ */
+export type CliCommand = {
+    line: number;
+    command: string;
+    name: string;
+    value?: string;
+    profile?: (number | null);
+    rateprofile?: (number | null);
+};
+
@@ -0,0 +1,10 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+import type { FacetCount } from './FacetCount';
+export type Facets = {
+    tags: Array<FacetCount>;
+    authors: Array<FacetCount>;
+};
+
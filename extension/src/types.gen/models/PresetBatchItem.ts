@@ -0,0 +1,11 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+import type { Preset } from './Preset';
+export type PresetBatchItem = {
+    id: number;
+    found: boolean;
+    preset?: (Preset | null);
+};
+
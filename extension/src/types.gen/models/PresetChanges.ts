@@ -0,0 +1,11 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+import type { PresetMetadata } from './PresetMetadata';
+export type PresetChanges = {
+    revision: number;
+    changed: Array<PresetMetadata>;
+    deleted: Array<number>;
+};
+
@@ -0,0 +1,14 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+import type { CliCommand } from './CliCommand';
+import type { SettingConflict } from './SettingConflict';
+export type PresetDiff = {
+    a: number;
+    b: number;
+    only_in_a: Array<CliCommand>;
+    only_in_b: Array<CliCommand>;
+    changed: Array<SettingConflict>;
+};
+
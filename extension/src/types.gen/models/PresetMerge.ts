@@ -0,0 +1,13 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+import type { CliCommand } from './CliCommand';
+import type { SettingConflict } from './SettingConflict';
+export type PresetMerge = {
+    ids: Array<number>;
+    commands: Array<CliCommand>;
+    conflicts: Array<SettingConflict>;
+    content: string;
+};
+
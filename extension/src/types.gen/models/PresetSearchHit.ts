@@ -0,0 +1,14 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+export type PresetSearchHit = {
+    id: number;
+    name: string;
+    description: string;
+    author: string;
+    tags: Array<string>;
+    rank: number;
+    snippet: string;
+};
+
@@ -7,5 +7,6 @@ export type PresetsCatalog = {
     presets_metadata: Array<PresetMetadata>;
     authors: Array<string>;
     tags: Array<string>;
+    revision?: number;
 };
 
@@ -0,0 +1,10 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+export type SearchFilterResults = {
+    filter_id: number;
+    revision: number;
+    ids: Array<number>;
+};
+
@@ -0,0 +1,12 @@
+/* generated using openapi-typescript-codegen -- do not edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+import type { SettingValue } from './SettingValue';
+export type SettingConflict = {
+    name: string;
+    profile?: (number | null);
+    rateprofile?: (number | null);
+    values: Array<SettingValue>;
+};
+
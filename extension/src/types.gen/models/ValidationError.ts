@@ -6,5 +6,7 @@ export type ValidationError = {
     loc: Array<(string | number)>;
     msg: string;
     type: string;
+    input?: any;
+    ctx?: any;
 };
 
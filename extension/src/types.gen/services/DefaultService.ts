@@ -2,9 +2,19 @@
 /* istanbul ignore file */
 /* tslint:disable */
 /* eslint-disable */
+import type { BulkImportResult } from '../models/BulkImportResult';
+import type { CliCommand } from '../models/CliCommand';
+import type { Facets } from '../models/Facets';
 import type { Preset } from '../models/Preset';
+import type { PresetBatchItem } from '../models/PresetBatchItem';
+import type { PresetChanges } from '../models/PresetChanges';
+import type { PresetDiff } from '../models/PresetDiff';
+import type { PresetFilterResult } from '../models/PresetFilterResult';
+import type { PresetMerge } from '../models/PresetMerge';
 import type { PresetsCatalog } from '../models/PresetsCatalog';
+import type { PresetSearchHit } from '../models/PresetSearchHit';
 import type { SearchFilter } from '../models/SearchFilter';
+import type { SearchFilterResults } from '../models/SearchFilterResults';
 import type { CancelablePromise } from '../core/CancelablePromise';
 import { OpenAPI } from '../core/OpenAPI';
 import { request as __request } from '../core/request';
@@ -33,34 +43,234 @@ export class DefaultService {
     }
     /**
      * Read Catalog
+     * @param after
+     * @param limit
      * @returns PresetsCatalog Successful Response
      * @throws ApiError
      */
-    public static getPresetsCatalog(): CancelablePromise<PresetsCatalog> {
+    public static getPresetsCatalog(
+        after?: (number | null),
+        limit?: (number | null),
+    ): CancelablePromise<PresetsCatalog> {
         return __request(OpenAPI, {
             method: 'GET',
             url: '/presets/catalog',
+            query: {
+                'after': after,
+                'limit': limit,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
         });
     }
     /**
      * Read Presets
+     * @param after
+     * @param limit
+     * @param stream
+     * @param tags
+     * @param tagMode
+     * @param author
+     * @param sets
      * @returns Preset Successful Response
      * @throws ApiError
      */
-    public static getAllPresets(): CancelablePromise<Array<Preset>> {
+    public static getAllPresets(
+        after?: (number | null),
+        limit: number = 128,
+        stream: boolean = false,
+        tags: Array<string> = [],
+        tagMode: 'and' | 'or' = 'and',
+        author?: (string | null),
+        sets: Array<string> = [],
+    ): CancelablePromise<Array<Preset>> {
         return __request(OpenAPI, {
             method: 'GET',
             url: '/presets',
+            query: {
+                'after': after,
+                'limit': limit,
+                'stream': stream,
+                'tags': tags,
+                'tag_mode': tagMode,
+                'author': author,
+                'sets': sets,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Read Presets Batch
+     * @param ids
+     * @returns PresetBatchItem Successful Response
+     * @throws ApiError
+     */
+    public static getPresetsBatch(
+        ids: Array<number>,
+    ): CancelablePromise<Array<PresetBatchItem>> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/presets/batch',
+            query: {
+                'ids': ids,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Read Preset Changes
+     * @param since
+     * @returns PresetChanges Successful Response
+     * @throws ApiError
+     */
+    public static getPresetChanges(
+        since: number,
+    ): CancelablePromise<PresetChanges> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/presets/changes',
+            query: {
+                'since': since,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Search Presets
+     * @param q
+     * @param offset
+     * @param limit
+     * @returns PresetSearchHit Successful Response
+     * @throws ApiError
+     */
+    public static searchPresets(
+        q: string,
+        offset?: number,
+        limit: number = 128,
+    ): CancelablePromise<Array<PresetSearchHit>> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/presets/search',
+            query: {
+                'q': q,
+                'offset': offset,
+                'limit': limit,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Filter Presets
+     * @param q
+     * @param after
+     * @param limit
+     * @returns PresetFilterResult Successful Response
+     * @throws ApiError
+     */
+    public static filterPresets(
+        q: string,
+        after?: (number | null),
+        limit: number = 128,
+    ): CancelablePromise<PresetFilterResult> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/presets/filter',
+            query: {
+                'q': q,
+                'after': after,
+                'limit': limit,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Merge Presets
+     * @param ids
+     * @returns PresetMerge Successful Response
+     * @throws ApiError
+     */
+    public static mergePresets(
+        ids: Array<number>,
+    ): CancelablePromise<PresetMerge> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/presets/merge',
+            query: {
+                'ids': ids,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Diff Presets
+     * @param a
+     * @param b
+     * @returns PresetDiff Successful Response
+     * @throws ApiError
+     */
+    public static diffPresets(
+        a: number,
+        b: number,
+    ): CancelablePromise<PresetDiff> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/presets/diff',
+            query: {
+                'a': a,
+                'b': b,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Create Presets Bulk
+     * @param requestBody
+     * @param batchSize
+     * @returns BulkImportResult Successful Response
+     * @throws ApiError
+     */
+    public static createPresetsBulk(
+        requestBody: Array<Preset>,
+        batchSize: number = 500,
+    ): CancelablePromise<BulkImportResult> {
+        return __request(OpenAPI, {
+            method: 'POST',
+            url: '/presets/bulk',
+            query: {
+                'batch_size': batchSize,
+            },
+            body: requestBody,
+            mediaType: 'application/json',
+            errors: {
+                422: `Validation Error`,
+            },
         });
     }
     /**
      * Read Preset
      * @param presetId
+     * @param format
      * @returns Preset Successful Response
      * @throws ApiError
      */
     public static getPreset(
         presetId: number,
+        format: 'full' | 'compact' = 'full',
     ): CancelablePromise<Preset> {
         return __request(OpenAPI, {
             method: 'GET',
@@ -68,6 +278,55 @@ export class DefaultService {
             path: {
                 'preset_id': presetId,
             },
+            query: {
+                'format': format,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Read Preset Commands
+     * @param presetId
+     * @returns CliCommand Successful Response
+     * @throws ApiError
+     */
+    public static getPresetCommands(
+        presetId: number,
+    ): CancelablePromise<Array<CliCommand>> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/presets/{preset_id}/commands',
+            path: {
+                'preset_id': presetId,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Read Facets
+     * @param tags
+     * @param tagMode
+     * @param author
+     * @returns Facets Successful Response
+     * @throws ApiError
+     */
+    public static getFacets(
+        tags: Array<string> = [],
+        tagMode: 'and' | 'or' = 'and',
+        author?: (string | null),
+    ): CancelablePromise<Facets> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/facets',
+            query: {
+                'tags': tags,
+                'tag_mode': tagMode,
+                'author': author,
+            },
             errors: {
                 422: `Validation Error`,
             },
@@ -75,13 +334,48 @@ export class DefaultService {
     }
     /**
      * Read Search Filters
+     * @param after
+     * @param limit
+     * @param stream
      * @returns SearchFilter Successful Response
      * @throws ApiError
      */
-    public static getAllSearchFilters(): CancelablePromise<Array<SearchFilter>> {
+    public static getAllSearchFilters(
+        after?: (number | null),
+        limit: number = 128,
+        stream: boolean = false,
+    ): CancelablePromise<Array<SearchFilter>> {
         return __request(OpenAPI, {
             method: 'GET',
             url: '/search_filters',
+            query: {
+                'after': after,
+                'limit': limit,
+                'stream': stream,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+    /**
+     * Read Search Filter Results
+     * @param filterId
+     * @returns SearchFilterResults Successful Response
+     * @throws ApiError
+     */
+    public static getSearchFilterResults(
+        filterId: number,
+    ): CancelablePromise<SearchFilterResults> {
+        return __request(OpenAPI, {
+            method: 'GET',
+            url: '/search_filters/{filter_id}/results',
+            path: {
+                'filter_id': filterId,
+            },
+            errors: {
+                422: `Validation Error`,
+            },
         });
     }
     /**